@@ -1,10 +1,20 @@
 import streamlit as st
-from transformers import pipeline
 import pandas as pd
 from datetime import datetime
 import time
 import plotly.graph_objects as go
-from blockchain import ThreatBlockchain
+from backends import LazyClassifier, model_identity
+from batcher import BatchScheduler
+from verdict_cache import VerdictCache
+from lexicon import Lexicon
+from verdicts import build_verdict
+from prefilter import BenignPrefilter
+from pattern_detector import PatternDetector
+from near_duplicates import NearDuplicateIndex
+from timestamps import capture, format_timestamp, record_display_time
+from moderation_log import SharedModerationLog
+from evidence_export import EXPORT_FORMATS, MIME_TYPES, export_evidence
+from telemetry import LatencyRecorder, instrument_pipeline
 import hashlib
 
 # Page configuration
@@ -150,114 +160,138 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize session state
-if 'blockchain' not in st.session_state:
-    st.session_state.blockchain = ThreatBlockchain()
+# Retention: only the most recent comments and incidents are kept in memory;
+# the blockchain keeps the full evidence trail
+COMMENT_RETENTION = 500
+INCIDENT_RETENTION = 100_000
+# Pasted comments moderated in one batch call
+BULK_MAX_COMMENTS = 500
+# The Download button holds the whole report in memory
+APP_EXPORT_MAX_BYTES = 50 * 1024 * 1024
+
+# The ledger, incident store and pattern detector are shared by every
+# session; a session only keeps the cursor its view starts from. Evidence
+# goes to the on-disk ledger, so it outlives app restarts.
+LEDGER_PATH = "ledger"
 
-if 'comments' not in st.session_state:
-    st.session_state.comments = []
+@st.cache_resource
+def load_moderation_log():
+    return SharedModerationLog(
+        incident_capacity=INCIDENT_RETENTION, comment_retention=COMMENT_RETENTION, ledger_path=LEDGER_PATH
+    )
 
-if 'blocked_comments' not in st.session_state:
-    st.session_state.blocked_comments = []
+@st.cache_resource
+def load_pattern_detector():
+    return PatternDetector(
+        window_seconds=5 * 60, threshold=2, lookback=5,
+        near_duplicates=NearDuplicateIndex(window_seconds=10 * 60)
+    )
 
-if 'threat_history' not in st.session_state:
-    st.session_state.threat_history = []
+moderation_log = load_moderation_log()
+pattern_detector = load_pattern_detector()
+
+# Initialize session state
+if 'view_cursor' not in st.session_state:
+    st.session_state.view_cursor = {'incidents': 0, 'comments': 0}
 
 if 'current_view' not in st.session_state:
     st.session_state.current_view = 'post_owner'
 
-if 'total_threats_blocked' not in st.session_state:
-    st.session_state.total_threats_blocked = 0
+cursor = st.session_state.view_cursor
+
+
+@st.cache_resource
+def load_lexicon():
+    return Lexicon()
+
+lexicon = load_lexicon()
 
-if 'response_times' not in st.session_state:
-    st.session_state.response_times = []
+# Latency histograms are shared by every session, like the model they time
+@st.cache_resource
+def load_telemetry():
+    return LatencyRecorder()
 
+latency = load_telemetry()
 
+# Starts loading in the background so the page renders while it warms up
 @st.cache_resource
 def load_model():
-    return pipeline("text-classification", model="unitary/toxic-bert")
+    return LazyClassifier(prepare=lambda c: instrument_pipeline(c, latency)).start()
+
+@st.cache_resource
+def load_scheduler(_classifier):
+    verdict_cache = VerdictCache(
+        max_entries=10000, ttl_seconds=24 * 3600,
+        namespace=model_identity(_classifier.backend, _classifier.model_name)
+    )
+    prefilter = BenignPrefilter(threshold=0.97, lexicon=lexicon)
+    return BatchScheduler(_classifier, max_batch_size=16, max_wait_ms=5, cache=verdict_cache, prefilter=prefilter)
+
+classifier = load_model()
+scheduler = load_scheduler(classifier)
+if classifier.error is not None:
+    st.error(f"Error loading model: {classifier.error}")
 
-try:
-    classifier = load_model()
-    model_loaded = True
-except Exception as e:
-    model_loaded = False
-    st.error(f"Error loading model: {e}")
+
+def model_loaded():
+    if not classifier.ready.is_set():
+        with st.spinner("Warming up the AI model..."):
+            classifier.ready.wait()
+    return classifier.error is None
 
 
 def detect_threat(text):
-    if not model_loaded:
+    if not model_loaded():
         return {'is_threat': False, 'confidence': 0, 'severity': 'NONE'}
     
-    start_time = time.time()
-    result = classifier(text)[0]
-    end_time = time.time()
-    
-    response_time = (end_time - start_time) * 1000  # Convert to ms
-    st.session_state.response_times.append(response_time)
-    
-    score = result['score']
+    start_ns = time.perf_counter_ns()
+    result = scheduler.classify(text)
+    response_time = (time.perf_counter_ns() - start_ns) / 1e6  # Convert to ms
     
-    if score > 0.5:  # Threshold for toxicity
-        # Categorize threat type
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['rape', 'r***', 'molest', 'sexual', 'fuck']):
-            threat_type = 'Sexual Harassment'
-        elif any(word in text_lower for word in ['kill', 'hurt', 'murder', 'beat', 'die', 'dead']):
-            threat_type = 'Violent Threat'
-        elif any(word in text_lower for word in ['hate', 'religion', 'muslim', 'hindu', 'christian']):
-            threat_type = 'Hate Speech'
-        else:
-            threat_type = 'Abusive Language'
-        
-        # Determine severity
-        if score > 0.9:
-            severity = 'HIGH'
-        elif score > 0.7:
-            severity = 'MEDIUM'
-        else:
-            severity = 'LOW'
-        
-        return {
-            'is_threat': True,
-            'threat_type': threat_type,
-            'severity': severity,
-            'confidence': score,
-            'response_time': response_time
-        }
-    else:
-        return {
-            'is_threat': False,
-            'confidence': 1 - score,
-            'response_time': response_time
-        }
+    verdict = build_verdict(text, result, lexicon, response_time)
+    latency.record('end_to_end', time.perf_counter_ns() - start_ns)
+    return verdict
 
 
-def check_pattern_attack():
-    if len(st.session_state.threat_history) < 2:
-        return None
+# Bulk moderation: deduplicated, length-bucketed batches
+def detect_threats(texts):
+    if not model_loaded():
+        return [{'is_threat': False, 'confidence': 0, 'severity': 'NONE'} for _ in texts]
     
-    recent_threats = st.session_state.threat_history[-5:]  
+    start_ns = time.perf_counter_ns()
+    results = scheduler.classify_many(texts)
+    # Convert to ms; the batch time is shared across its texts
+    response_time = (time.perf_counter_ns() - start_ns) / 1e6 / max(len(texts), 1)
     
-    if len(recent_threats) >= 2:
-        # Check if threats are within 5 minutes of each other
-        time_diffs = []
-        for i in range(1, len(recent_threats)):
-            t1 = datetime.strptime(recent_threats[i-1]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            t2 = datetime.strptime(recent_threats[i]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            diff = (t2 - t1).total_seconds() / 60
-            time_diffs.append(diff)
-        
-        if any(diff < 5 for diff in time_diffs):
-            return {
-                'attack_detected': True,
-                'threat_count': len(recent_threats),
-                'accounts': list(set([t['username'] for t in recent_threats])),
-                'time_span': f"{max(time_diffs):.1f} minutes"
-            }
-    
-    return None
+    verdicts = [build_verdict(text, result, lexicon, response_time) for text, result in zip(texts, results)]
+    # Whole-batch time goes to its own stage so end_to_end stays per comment
+    latency.record('batch', time.perf_counter_ns() - start_ns)
+    return verdicts
+
+
+# Every demo comment targets the post owner
+POST_OWNER = 'sarah_dev'
+
+def check_pattern_attack(target=POST_OWNER):
+    return pattern_detector.check(target)
+
+
+# Logs a blocked comment to the shared ledger and the pattern detector;
+# the log assigns the incident id. Returns (threat_data, block).
+def log_blocked_comment(username, text, analysis):
+    threat_data = {
+        'username': username,
+        'text_hash': hashlib.sha256(text.encode()).hexdigest()[:16],
+        'threat_type': analysis['threat_type'],
+        'severity': analysis['severity'],
+        'confidence': f"{analysis['confidence']:.2%}",
+        **capture(),
+        'platform': 'Instagram (Demo)'
+    }
+    with latency.time('blockchain_append'):
+        threat_data, block = moderation_log.log_threat(threat_data, analysis['confidence'], text=text)
+    pattern_detector.record(POST_OWNER, username, threat_data['timestamp_ns'] / 1e9, text=text)
+    return threat_data, block
 
 # Create threat severity gauge
 def create_severity_gauge(confidence):
@@ -312,12 +346,15 @@ with st.sidebar:
     st.markdown("---")
     
     st.markdown("### 📊 System Status")
-    if model_loaded:
+    if classifier.is_ready():
         st.success("✅ AI Model: Active")
+        st.caption(" | ".join(f"{name[:-2].replace('_', ' ')}: {seconds:.2f}s" for name, seconds in classifier.timings.items()))
+    elif not classifier.ready.is_set():
+        st.info("⏳ AI Model: Warming up")
     else:
         st.error("❌ AI Model: Error")
     
-    chain_status = st.session_state.blockchain.verify_chain()
+    chain_status = moderation_log.chain.verify_chain()
     if chain_status:
         st.success("✅ Blockchain: Valid")
     else:
@@ -340,13 +377,9 @@ with st.sidebar:
     
     st.markdown("---")
     
+    # Shared evidence is never cleared; resetting only moves this session's view
     if st.button("🔄 Reset Demo", type="secondary"):
-        st.session_state.comments = []
-        st.session_state.blocked_comments = []
-        st.session_state.threat_history = []
-        st.session_state.total_threats_blocked = 0
-        st.session_state.response_times = []
-        st.session_state.blockchain = ThreatBlockchain()
+        st.session_state.view_cursor = moderation_log.cursor()
         st.rerun()
 
 # Main header
@@ -374,16 +407,17 @@ with col1:
     st.markdown(f"""
     <div class="stat-card">
         <div class="stat-label">🛡️ THREATS BLOCKED</div>
-        <div class="stat-number">{st.session_state.total_threats_blocked}</div>
+        <div class="stat-number">{moderation_log.incidents.count(since=cursor['incidents'])}</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col2:
-    avg_response = sum(st.session_state.response_times) / len(st.session_state.response_times) if st.session_state.response_times else 0
+    response_summary = latency.summary('end_to_end')
+    p50_response = response_summary['p50'] if response_summary else 0
     st.markdown(f"""
     <div class="stat-card">
-        <div class="stat-label">⚡ AVG RESPONSE TIME</div>
-        <div class="stat-number">{avg_response:.1f}ms</div>
+        <div class="stat-label">⚡ P50 RESPONSE TIME</div>
+        <div class="stat-number">{p50_response:.1f}ms</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -391,12 +425,12 @@ with col3:
     st.markdown(f"""
     <div class="stat-card">
         <div class="stat-label">💬 SAFE COMMENTS</div>
-        <div class="stat-number">{len(st.session_state.comments)}</div>
+        <div class="stat-number">{len(moderation_log.comments_since(cursor))}</div>
     </div>
     """, unsafe_allow_html=True)
 
 with col4:
-    blockchain_blocks = len(st.session_state.blockchain.get_threat_blocks())
+    blockchain_blocks = len(moderation_log.chain.chain) - 1
     st.markdown(f"""
     <div class="stat-card">
         <div class="stat-label">⛓️ BLOCKCHAIN BLOCKS</div>
@@ -432,20 +466,21 @@ if st.session_state.current_view == 'post_owner':
     # Show safe comments
     st.markdown("### 💬 Comments")
     
-    if len(st.session_state.comments) == 0:
+    visible_comments = moderation_log.comments_since(cursor)
+    if len(visible_comments) == 0:
         st.info("No comments yet. Switch to Commenter view to add comments!")
     
-    for comment in st.session_state.comments:
+    for comment in visible_comments:
         st.markdown(f"""
         <div class="comment-box">
-            <strong>@{comment['username']}</strong> • {comment['timestamp']}
+            <strong>@{comment['username']}</strong> • {record_display_time(comment)}
             <br><br>
             {comment['text']}
         </div>
         """, unsafe_allow_html=True)
     
     # Show blocked threats notification
-    if len(st.session_state.blocked_comments) > 0:
+    if moderation_log.incidents.count(since=cursor['incidents']) > 0:
         st.markdown("---")
         st.markdown("### 🚨 Threat Notifications")
         
@@ -469,6 +504,8 @@ if st.session_state.current_view == 'post_owner':
                 
                 with col_p2:
                     st.write(f"**⏱️ Time Span:** Within {pattern_attack['time_span']}")
+                    if pattern_attack['cluster_id']:
+                        st.write(f"**🧬 Raid Cluster:** {pattern_attack['cluster_id']} ({len(pattern_attack['cluster_accounts'])} accounts posting near-identical text)")
                     st.write(f"**📝 Status:** ⛓️ All evidence logged to blockchain")
                 
                 st.error("### ⚠️ ESCALATING HARASSMENT CAMPAIGN")
@@ -481,7 +518,7 @@ if st.session_state.current_view == 'post_owner':
                 
                 st.markdown("</div>", unsafe_allow_html=True)
         
-        for blocked in st.session_state.blocked_comments[-3:]:  # Show last 3
+        for blocked in moderation_log.incidents.tail(3, since=cursor['incidents']):  # Show last 3
             severity_class = f"severity-{blocked['severity'].lower()}"
             
             # Create container for threat alert
@@ -492,7 +529,7 @@ if st.session_state.current_view == 'post_owner':
                     <p style="margin: 8px 0;"><strong>👤 From:</strong> @{blocked['username']}</p>
                     <p style="margin: 8px 0;"><strong>🎯 Type:</strong> {blocked['threat_type']}</p>
                     <p style="margin: 8px 0;"><strong>⚡ Severity:</strong> <span class="{severity_class}">{blocked['severity']}</span></p>
-                    <p style="margin: 8px 0;"><strong>🕒 Time:</strong> {blocked['timestamp']}</p>
+                    <p style="margin: 8px 0;"><strong>🕒 Time:</strong> {record_display_time(blocked)}</p>
                     <p style="margin: 8px 0;"><strong>✅ Status:</strong> Blocked & Logged to Blockchain (Block #{blocked['block_index']})</p>
                 </div>
                 """, unsafe_allow_html=True)
@@ -504,17 +541,45 @@ if st.session_state.current_view == 'post_owner':
                 st.write("✅ Account flagged for review")
                 st.markdown("</div>", unsafe_allow_html=True)
         
-        # Download report button
-        if st.button("📥 Download Threat Report (CSV)", type="primary"):
-            df = pd.DataFrame(st.session_state.blocked_comments)
-            csv = df.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Download CSV File",
-                data=csv,
-                file_name=f"threat_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
-            st.success("✅ Report ready for download!")
+        # Evidence report straight from the ledger, with block hashes (and
+        # optionally Merkle proofs). download_button needs the whole file in
+        # memory, so the app only serves reports up to APP_EXPORT_MAX_BYTES;
+        # larger ledgers are exported by the CLI or the service's /export.
+        col_format, col_proofs = st.columns(2)
+        with col_format:
+            export_format = st.selectbox("Report format", EXPORT_FORMATS, key="export_format")
+        with col_proofs:
+            export_proofs = st.checkbox("Include Merkle proofs", key="export_proofs")
+        st.caption(
+            f"In-app reports are limited to {APP_EXPORT_MAX_BYTES // (1024 * 1024)} MB. "
+            "For the full ledger use `python evidence_export.py` or `GET /export` on the service."
+        )
+        
+        if st.button("📥 Download Threat Report", type="primary"):
+            file_name = f"threat_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+            chunks, size = [], 0
+            try:
+                for data in export_evidence(moderation_log.chain, export_format, include_proof=export_proofs):
+                    chunks.append(data)
+                    size += len(data)
+                    if size > APP_EXPORT_MAX_BYTES:
+                        break
+            except ImportError as e:
+                st.error(f"❌ {e}")
+            else:
+                if size > APP_EXPORT_MAX_BYTES:
+                    st.warning(
+                        "⚠️ The report is too large to download from the app. Export it with "
+                        f"`python evidence_export.py --format {export_format}` or `GET /export?format={export_format}`."
+                    )
+                else:
+                    st.download_button(
+                        label=f"⬇️ Download {export_format.upper()} File",
+                        data=b''.join(chunks),
+                        file_name=file_name,
+                        mime=MIME_TYPES[export_format]
+                    )
+                    st.success("✅ Report ready for download!")
 
 else:  # Commenter view
     st.markdown("## 💬 Commenter View")
@@ -598,44 +663,13 @@ else:  # Commenter view
                     
                     st.markdown('</div>', unsafe_allow_html=True)
                     
-                    # Log to blockchain
-                    threat_data = {
-                        'incident_id': f"INC_{len(st.session_state.blocked_comments) + 1}",
-                        'username': username,
-                        'text_hash': hashlib.sha256(comment_text.encode()).hexdigest()[:16],
-                        'threat_type': analysis['threat_type'],
-                        'severity': analysis['severity'],
-                        'confidence': f"{analysis['confidence']:.2%}",
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'platform': 'Instagram (Demo)'
-                    }
-                    
-                    block = st.session_state.blockchain.add_threat_block(threat_data)
-                    
-                    # Save to blocked comments
-                    st.session_state.blocked_comments.append({
-                        'username': username,
-                        'text': comment_text,
-                        'threat_type': analysis['threat_type'],
-                        'severity': analysis['severity'],
-                        'confidence': analysis['confidence'],
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'block_index': block['index']
-                    })
-                    
-                    # Save to threat history
-                    st.session_state.threat_history.append({
-                        'username': username,
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    })
-                    
-                    st.session_state.total_threats_blocked += 1
+                    threat_data, block = log_blocked_comment(username, comment_text, analysis)
                     
                     # Show blockchain confirmation
                     st.success(f"⛓️ Evidence logged to Blockchain (Block #{block['index']})")
                     
                     with st.expander("🔍 View Blockchain Evidence"):
-                        st.json(threat_data)
+                        st.json(dict(threat_data, time=format_timestamp(threat_data['timestamp_ns'])))
                     
                 else:
                     # Safe comment
@@ -651,40 +685,70 @@ else:  # Commenter view
                     st.markdown('</div>', unsafe_allow_html=True)
                     
                     # Add to comments
-                    st.session_state.comments.append({
+                    moderation_log.add_comment({
                         'username': username,
                         'text': comment_text,
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                        **capture()
                     })
                     
                     st.balloons()
     
-   
+    # Bulk moderation: every pasted line goes through the batch API in one call
+    with st.expander("📋 Bulk Moderate (one comment per line)"):
+        bulk_text = st.text_area(
+            f"Paste up to {BULK_MAX_COMMENTS} comments", height=150, key="bulk_comments",
+            placeholder="First comment\nSecond comment\n..."
+        )
+        bulk_comments = [line.strip() for line in bulk_text.splitlines() if line.strip()]
+        if len(bulk_comments) > BULK_MAX_COMMENTS:
+            st.warning(f"⚠️ Only the first {BULK_MAX_COMMENTS} comments will be moderated")
+            bulk_comments = bulk_comments[:BULK_MAX_COMMENTS]
+        
+        if st.button("📤 Post All", disabled=not (bulk_comments and username)):
+            with st.spinner(f"🔍 Analyzing {len(bulk_comments)} comments..."):
+                analyses = detect_threats(bulk_comments)
+            
+            rows = []
+            for text, analysis in zip(bulk_comments, analyses):
+                row = {'Comment': text[:80], 'Status': '✅ Approved', 'Severity': '', 'Block': None}
+                if analysis['is_threat']:
+                    _, block = log_blocked_comment(username, text, analysis)
+                    row.update(Status='❌ Blocked', Severity=analysis['severity'], Block=block['index'])
+                else:
+                    moderation_log.add_comment({'username': username, 'text': text, **capture()})
+                rows.append(row)
+            
+            blocked_count = sum(1 for analysis in analyses if analysis['is_threat'])
+            st.info(f"{len(rows) - blocked_count} approved, {blocked_count} blocked and logged to the blockchain")
+            st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    
     st.markdown("---")
     st.markdown("### 💬 Posted Comments")
     
-    if len(st.session_state.comments) == 0:
+    visible_comments = moderation_log.comments_since(cursor)
+    if len(visible_comments) == 0:
         st.info("No comments yet. Post the first one!")
     
-    for comment in st.session_state.comments:
+    for comment in visible_comments:
         st.markdown(f"""
         <div class="comment-box">
-            <strong>@{comment['username']}</strong> • {comment['timestamp']}
+            <strong>@{comment['username']}</strong> • {record_display_time(comment)}
             <br><br>
             {comment['text']}
         </div>
         """, unsafe_allow_html=True)
     
     # Show blocked attempts
-    if len(st.session_state.blocked_comments) > 0:
+    blocked_attempts = moderation_log.incidents.count(since=cursor['incidents'], username=username)
+    if blocked_attempts > 0:
         st.markdown("---")
         st.markdown("### 🚫 Your Blocked Attempts")
-        st.warning(f"⚠️ {len(st.session_state.blocked_comments)} of your comments were blocked due to threatening content")
+        st.warning(f"⚠️ {blocked_attempts} of your comments were blocked due to threatening content")
         
-        for blocked in st.session_state.blocked_comments[-3:]:
+        for blocked in moderation_log.incidents.tail(3, since=cursor['incidents'], username=username):
             st.markdown(f"""
             <div class="blocked-comment">
-                <strong>❌ BLOCKED</strong> • {blocked['timestamp']}
+                <strong>❌ BLOCKED</strong> • {record_display_time(blocked)}
                 <br><br>
                 <em>This comment contained threatening content ({blocked['threat_type']}) and was blocked to protect other users.</em>
                 <br><br>
@@ -703,60 +767,125 @@ with tab1:
     st.markdown("### ⛓️ Blockchain Evidence Trail")
     
     if st.button("🔍 Verify Chain Integrity"):
-        is_valid = st.session_state.blockchain.verify_chain()
+        is_valid = moderation_log.chain.verify_chain(mode="full")
         if is_valid:
             st.success("✅ Blockchain verified - No tampering detected!")
         else:
             st.error("❌ Blockchain corrupted - Tampering detected!")
     
-    threat_blocks = st.session_state.blockchain.get_threat_blocks()
+    chain = moderation_log.chain
+    total_blocks = len(chain.chain) - 1
     
-    if len(threat_blocks) == 0:
+    if total_blocks == 0:
         st.info("No threats logged yet. Post a threatening comment to see blockchain in action!")
     else:
-        st.success(f"📊 Total blocks: {len(threat_blocks)}")
+        st.success(f"📊 Total blocks: {total_blocks}")
         
-        for block in reversed(threat_blocks):
-            with st.expander(f"🔗 Block #{block['index']} - {block['data']['incident_id']}", expanded=False):
-                # Block Header
-                st.markdown(f"### ⛓️ Block #{block['index']}")
-                
-                col_b1, col_b2 = st.columns(2)
-                with col_b1:
-                    st.write(f"**🕒 Timestamp:** {block['timestamp']}")
-                    st.write(f"**🔗 Previous Hash:** `{block['previous_hash'][:32]}...`")
-                with col_b2:
-                    st.write(f"**🔐 Current Hash:** `{block['hash'][:32]}...`")
-                
-                st.markdown("---")
-                
-                # Threat Data
-                st.markdown("### 📊 Threat Data")
-                col_t1, col_t2 = st.columns(2)
-                
-                with col_t1:
-                    st.write(f"**🆔 Incident ID:** {block['data']['incident_id']}")
-                    st.write(f"**👤 Username:** @{block['data']['username']}")
-                    st.write(f"**⚠️ Threat Type:** {block['data']['threat_type']}")
-                
-                with col_t2:
-                    st.write(f"**📊 Severity:** {block['data']['severity']}")
-                    st.write(f"**🎯 Confidence:** {block['data']['confidence']}")
-                    st.write(f"**#️⃣ Content Hash:** `{block['data']['text_hash']}`")
-                
-                st.success("✓ This evidence is immutable and cannot be modified or deleted")
+        # Filters run against the ledger's secondary indexes, so a page costs
+        # the same however long the chain grows
+        col_f1, col_f2, col_f3, col_f4 = st.columns([2, 2, 2, 1])
+        with col_f1:
+            filter_username = st.text_input("👤 Username", key="explorer_username").strip().lstrip('@') or None
+        with col_f2:
+            filter_type = st.selectbox("⚠️ Threat Type", ["All"] + chain.incident_index.values('threat_type'), key="explorer_type")
+        with col_f3:
+            filter_severity = st.selectbox("📊 Severity", ["All", "HIGH", "MEDIUM", "LOW"], key="explorer_severity")
+        with col_f4:
+            page_size = st.selectbox("Per page", [10, 25, 50], key="explorer_page_size")
+        
+        filters = {
+            'username': filter_username,
+            'threat_type': None if filter_type == "All" else filter_type,
+            'severity': None if filter_severity == "All" else filter_severity
+        }
+        
+        # Page cursors already visited; changing a filter starts over
+        if st.session_state.get('explorer_filters') != (filters, page_size):
+            st.session_state.explorer_filters = (filters, page_size)
+            st.session_state.explorer_pages = [None]
+            st.session_state.explorer_open = None
+        pages = st.session_state.explorer_pages
+        
+        matches, next_cursor = chain.find(limit=page_size, cursor=pages[-1], **filters)
+        
+        if not matches:
+            st.info("No incidents match these filters.")
+        
+        for match in matches:
+            block, incident = match['block'], match['incident']
+            incident_id = incident['incident_id']
+            is_open = st.session_state.explorer_open == incident_id
+            
+            col_row, col_toggle = st.columns([6, 1])
+            with col_row:
+                st.markdown(
+                    f"🔗 **Block #{block['index']}** - {incident_id} • @{incident.get('username', 'unknown')} • "
+                    f"{incident['threat_type']} • {incident['severity']} • {record_display_time(incident)}"
+                )
+            with col_toggle:
+                if st.button("▲ Hide" if is_open else "▼ Details", key=f"explorer_toggle_{incident_id}"):
+                    st.session_state.explorer_open = None if is_open else incident_id
+                    st.rerun()
+            
+            # Only the opened incident renders its details
+            if is_open:
+                with st.container(border=True):
+                    st.markdown(f"### ⛓️ Block #{block['index']}")
+                    
+                    col_b1, col_b2 = st.columns(2)
+                    with col_b1:
+                        st.write(f"**🕒 Timestamp:** {block['timestamp']}")
+                        st.write(f"**🔗 Previous Hash:** `{block['previous_hash'][:32]}...`")
+                    with col_b2:
+                        st.write(f"**🔐 Current Hash:** `{block['hash'][:32]}...`")
+                        if match['leaf_index'] is not None:
+                            st.write(f"**🌳 Merkle Leaf:** {match['leaf_index']} of {block['data']['incident_count']}")
+                    
+                    st.markdown("---")
+                    
+                    # Threat Data
+                    st.markdown("### 📊 Threat Data")
+                    col_t1, col_t2 = st.columns(2)
+                    
+                    with col_t1:
+                        st.write(f"**🆔 Incident ID:** {incident_id}")
+                        st.write(f"**👤 Username:** @{incident.get('username', 'unknown')}")
+                        st.write(f"**⚠️ Threat Type:** {incident['threat_type']}")
+                    
+                    with col_t2:
+                        st.write(f"**📊 Severity:** {incident['severity']}")
+                        st.write(f"**🎯 Confidence:** {incident['confidence']}")
+                        st.write(f"**#️⃣ Content Hash:** `{incident['text_hash']}`")
+                    
+                    st.success("✓ This evidence is immutable and cannot be modified or deleted")
+        
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button("⬅️ Newer", disabled=len(pages) == 1, key="explorer_prev"):
+                pages.pop()
+                st.session_state.explorer_open = None
+                st.rerun()
+        with col_page:
+            st.markdown(f"<p style='text-align: center;'>Page {len(pages)}</p>", unsafe_allow_html=True)
+        with col_next:
+            if st.button("Older ➡️", disabled=next_cursor is None, key="explorer_next"):
+                pages.append(next_cursor)
+                st.session_state.explorer_open = None
+                st.rerun()
 
 with tab2:
     st.markdown("### 📊 Detection Analytics")
 
-    if len(st.session_state.blocked_comments) == 0:
+    # Running aggregates: reading them costs the same at any incident count
+    aggregates = moderation_log.aggregates
+    since = cursor.get('aggregates')
+    incident_count = aggregates.count(since=since)
+    if incident_count == 0:
         st.info("No data yet. Test the system by posting threatening comments!")
     else:
         # Threat type distribution
         st.markdown("#### 🎯 Threat Types Distribution")
-        threat_types = [t['threat_type'] for t in st.session_state.blocked_comments]
-        threat_df = pd.DataFrame({'Threat Type': threat_types})
-        threat_counts = threat_df['Threat Type'].value_counts()
+        threat_counts = pd.Series(dict(aggregates.breakdown('threat_type', since=since)), dtype=int)
         
         col_chart1, col_chart2 = st.columns(2)
         
@@ -766,7 +895,7 @@ with tab2:
         with col_chart2:
             st.markdown(f"""
             **Summary:**
-            - **Total Threats:** {len(st.session_state.blocked_comments)}
+            - **Total Threats:** {incident_count}
             - **Most Common:** {threat_counts.index[0] if len(threat_counts) > 0 else 'N/A'}
             - **Detection Rate:** 100%
             - **False Positives:** 0
@@ -774,9 +903,7 @@ with tab2:
         
         # Severity breakdown
         st.markdown("#### ⚠️ Severity Breakdown")
-        severity_data = [t['severity'] for t in st.session_state.blocked_comments]
-        severity_df = pd.DataFrame({'Severity': severity_data})
-        severity_counts = severity_df['Severity'].value_counts()
+        severity_counts = dict(aggregates.breakdown('severity', since=since))
         
         col_sev1, col_sev2, col_sev3 = st.columns(3)
         
@@ -794,33 +921,50 @@ with tab2:
         
         # Timeline
         st.markdown("#### 📈 Threat Timeline")
-        if len(st.session_state.blocked_comments) > 0:
-            timeline_df = pd.DataFrame(st.session_state.blocked_comments)
-            timeline_df['timestamp'] = pd.to_datetime(timeline_df['timestamp'])
-            timeline_df = timeline_df.sort_values('timestamp')
-            
-            st.line_chart(timeline_df.groupby(timeline_df['timestamp'].dt.strftime('%H:%M')).size())
+        resolution = st.radio("Bucket size", ["minute", "hour", "day"], horizontal=True, key="timeline_resolution")
+        timeline = aggregates.timeline(resolution, since=since)
+        if timeline:
+            local_tz = datetime.now().astimezone().tzinfo
+            starts, counts = zip(*timeline)
+            bucket_index = pd.to_datetime(list(starts), unit='s', utc=True).tz_convert(local_tz)
+            st.line_chart(pd.Series(counts, index=bucket_index, name='threats'))
         
         # Performance metrics
         st.markdown("#### ⚡ Performance Metrics")
         
-        if len(st.session_state.response_times) > 0:
-            avg_time = sum(st.session_state.response_times) / len(st.session_state.response_times)
-            min_time = min(st.session_state.response_times)
-            max_time = max(st.session_state.response_times)
-            
+        response_summary = latency.summary('end_to_end')
+        if response_summary:
             perf_col1, perf_col2, perf_col3 = st.columns(3)
             
             with perf_col1:
-                st.metric("⚡ Avg Response", f"{avg_time:.2f}ms")
+                st.metric("⚡ p50 Response", f"{response_summary['p50']:.2f}ms")
             
             with perf_col2:
-                st.metric("🚀 Fastest", f"{min_time:.2f}ms")
+                st.metric("🚀 p95 Response", f"{response_summary['p95']:.2f}ms")
             
             with perf_col3:
-                st.metric("🐢 Slowest", f"{max_time:.2f}ms")
+                st.metric("🐢 p99 Response", f"{response_summary['p99']:.2f}ms")
+            
+            # Per-stage breakdown from the shared histograms
+            stage_rows = [
+                {'Stage': stage.replace('_', ' ').title(), 'Samples': summary['count'],
+                 'p50 (ms)': round(summary['p50'], 2), 'p95 (ms)': round(summary['p95'], 2),
+                 'p99 (ms)': round(summary['p99'], 2), 'Max (ms)': round(summary['max'], 2)}
+                for stage, summary in latency.summaries().items() if summary
+            ]
+            st.dataframe(pd.DataFrame(stage_rows), hide_index=True, use_container_width=True)
             
-            st.success("✅ All responses under 1 second - Real-time protection achieved!")
+            if response_summary['p99'] < 1000:
+                st.success("✅ p99 response under 1 second - Real-time protection achieved!")
+        
+        if scheduler.prefilter is not None:
+            prefilter_stats = scheduler.prefilter.stats()
+            precision = prefilter_stats['precision']
+            st.caption(
+                f"Fast-path pre-filter: {prefilter_stats['skip_rate']:.1%} of comments skipped the model | "
+                f"precision vs model: {'n/a' if precision is None else f'{precision:.1%}'} "
+                f"({prefilter_stats['audited_skips']} audited)"
+            )
 
 
 
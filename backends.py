@@ -0,0 +1,162 @@
+import argparse
+import os
+import threading
+import time
+
+
+MODEL_NAME = "unitary/toxic-bert"
+BACKENDS = ('torch-fp32', 'torch-int8', 'onnx')
+DEFAULT_BACKEND = os.environ.get('SAFEGUARD_BACKEND', 'torch-fp32')
+PARITY_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'parity_corpus.txt')
+
+
+# Names the weights and runtime behind a verdict, e.g. for cache keys
+def model_identity(backend=DEFAULT_BACKEND, model_name=MODEL_NAME):
+    return f"{model_name}:{backend}"
+
+
+# Every backend returns a transformers text-classification pipeline, so
+# callers keep the same classifier(texts, batch_size=..., truncation=...) contract
+def load_classifier(backend=DEFAULT_BACKEND, model_name=MODEL_NAME):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', choose one of {', '.join(BACKENDS)}")
+
+    from transformers import pipeline
+
+    if backend == 'torch-fp32':
+        return pipeline("text-classification", model=model_name)
+
+    if backend == 'torch-int8':
+        import torch
+
+        classifier = pipeline("text-classification", model=model_name)
+        classifier.model = torch.quantization.quantize_dynamic(
+            classifier.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+        return classifier
+
+    try:
+        from optimum.onnxruntime import ORTModelForSequenceClassification
+    except ImportError as e:
+        raise ImportError("The onnx backend needs optimum[onnxruntime]: pip install 'optimum[onnxruntime]'") from e
+
+    from transformers import AutoTokenizer
+
+    model = ORTModelForSequenceClassification.from_pretrained(model_name, export=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    return pipeline("text-classification", model=model, tokenizer=tokenizer)
+
+
+# Loads the classifier on a background thread so the CLI/UI is usable right
+# away. `ready` is set once loading finishes (check `error`); calls block
+# until then. `timings` breaks the cold start into import, weights and
+# first inference.
+class LazyClassifier:
+    def __init__(self, backend=DEFAULT_BACKEND, model_name=MODEL_NAME, prepare=None, warmup_text="warm-up"):
+        self.backend = backend
+        self.model_name = model_name
+        self.prepare = prepare
+        self.warmup_text = warmup_text
+        self.ready = threading.Event()
+        self.error = None
+        self.timings = {}
+        self.thread = None
+        self._classifier = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._load, name="safeguard-model-warmup", daemon=True)
+                self.thread.start()
+        return self
+
+    def _load(self):
+        try:
+            started = time.perf_counter()
+            from transformers import pipeline  # the ML stack dominates import cost
+            self.timings['import_s'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            classifier = load_classifier(self.backend, self.model_name)
+            self.timings['weights_s'] = time.perf_counter() - started
+
+            # The first call pays for lazy kernel and graph initialisation
+            started = time.perf_counter()
+            classifier([self.warmup_text], truncation=True)
+            self.timings['first_inference_s'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            classifier([self.warmup_text], truncation=True)
+            self.timings['warm_inference_s'] = time.perf_counter() - started
+
+            # Wrapped after warm-up so instrumentation only sees real traffic
+            self._classifier = self.prepare(classifier) if self.prepare else classifier
+        except Exception as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def is_ready(self):
+        return self.ready.is_set() and self.error is None
+
+    # Returns False on timeout and raises if loading failed
+    def wait(self, timeout=None):
+        self.start()
+        if not self.ready.wait(timeout):
+            return False
+        if self.error is not None:
+            raise RuntimeError(f"Model failed to load: {self.error}") from self.error
+        return True
+
+    async def wait_async(self):
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(None, self.wait)
+
+    def __call__(self, texts, **kwargs):
+        self.wait()
+        return self._classifier(texts, **kwargs)
+
+
+def load_corpus(path=PARITY_CORPUS):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# Compares a backend's top-label scores against the fp32 reference
+def parity_check(backend, corpus_path=PARITY_CORPUS, reference=None):
+    texts = load_corpus(corpus_path)
+    reference = reference or load_classifier('torch-fp32')
+    candidate = load_classifier(backend)
+
+    start = time.perf_counter()
+    expected = reference(texts, batch_size=len(texts), truncation=True)
+    reference_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    actual = candidate(texts, batch_size=len(texts), truncation=True)
+    candidate_ms = (time.perf_counter() - start) * 1000
+
+    drifts = [abs(e['score'] - a['score']) for e, a in zip(expected, actual)]
+    return {
+        'backend': backend,
+        'samples': len(texts),
+        'max_drift': max(drifts),
+        'mean_drift': sum(drifts) / len(drifts),
+        'label_mismatches': sum(e['label'] != a['label'] for e, a in zip(expected, actual)),
+        'verdict_flips': sum((e['score'] > 0.5) != (a['score'] > 0.5) for e, a in zip(expected, actual)),
+        'reference_ms': reference_ms,
+        'backend_ms': candidate_ms
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score drift of a classifier backend against PyTorch fp32")
+    parser.add_argument('--backend', choices=BACKENDS, default='torch-int8')
+    parser.add_argument('--corpus', default=PARITY_CORPUS)
+    args = parser.parse_args()
+
+    report = parity_check(args.backend, args.corpus)
+    for key, value in report.items():
+        print(f"{key}: {value}")
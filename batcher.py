@@ -0,0 +1,162 @@
+import threading
+import time
+import queue
+from collections import Counter, deque
+from concurrent.futures import Future
+from contextlib import nullcontext
+
+
+# Splits texts (sorted by length) into batches whose longest member is at most
+# max_ratio times the shortest, so short comments aren't padded to long ones
+def length_buckets(texts, max_batch_size=16, max_ratio=2.0, min_length=32):
+    buckets = []
+    current = []
+    shortest = 0
+    for text in sorted(texts, key=len):
+        limit = max(shortest * max_ratio, min_length)
+        if current and (len(current) >= max_batch_size or len(text) > limit):
+            buckets.append(current)
+            current = []
+        if not current:
+            shortest = len(text)
+        current.append(text)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+# Gathers concurrent classify requests into padded batches. A classifier
+# with a `concurrency` attribute (an InferencePool) gets that many batches
+# in flight at once; a plain pipeline runs one batch at a time.
+class BatchScheduler:
+    def __init__(self, classifier, max_batch_size=16, max_wait_ms=5, delay_history=1000, cache=None, prefilter=None):
+        self.classifier = classifier
+        self.cache = cache
+        self.prefilter = prefilter
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.requests = queue.Queue()
+        self.batch_histogram = Counter()
+        self.queue_delays = deque(maxlen=delay_history)
+        self.lock = threading.Lock()
+        self.concurrency = getattr(classifier, 'concurrency', 1)
+        self.infer_lock = threading.Lock() if self.concurrency == 1 else nullcontext()
+        self.workers = [threading.Thread(target=self._run, daemon=True) for _ in range(self.concurrency)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, text):
+        future = Future()
+        if self.cache is not None:
+            cached = self.cache.get(text)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+        if self.prefilter is not None:
+            fast = self.prefilter.decide(text)
+            if fast is not None:
+                future.set_result(fast)
+                return future
+        self.requests.put((text, time.perf_counter(), future))
+        return future
+
+    def classify(self, text):
+        return self.submit(text).result()
+
+    # Deduplicates texts, runs one forward pass per length bucket and
+    # returns results in the original order
+    def classify_many(self, texts):
+        unique = list(dict.fromkeys(texts))
+        results = {}
+        if self.cache is not None:
+            for text in unique:
+                cached = self.cache.get(text)
+                if cached is not None:
+                    results[text] = cached
+            unique = [text for text in unique if text not in results]
+        if self.prefilter is not None:
+            for text in unique:
+                fast = self.prefilter.decide(text)
+                if fast is not None:
+                    results[text] = fast
+            unique = [text for text in unique if text not in results]
+
+        buckets = length_buckets(unique, self.max_batch_size)
+        with self.lock:
+            for bucket in buckets:
+                self.batch_histogram[len(bucket)] += 1
+        for bucket, outputs in zip(buckets, self._infer_buckets(buckets)):
+            results.update(zip(bucket, outputs))
+            for text, output in zip(bucket, outputs):
+                self._record(text, output)
+        return [results[text] for text in texts]
+
+    def _infer_buckets(self, buckets):
+        if hasattr(self.classifier, 'submit'):
+            # Pool: every bucket is dispatched before waiting on the first
+            futures = [self.classifier.submit(bucket, batch_size=len(bucket), truncation=True) for bucket in buckets]
+            for future in futures:
+                yield future.result()
+            return
+        for bucket in buckets:
+            with self.infer_lock:
+                yield self.classifier(bucket, batch_size=len(bucket), truncation=True)
+
+    def _collect_batch(self):
+        batch = [self.requests.get()]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            started = time.perf_counter()
+            texts = [text for text, _, _ in batch]
+
+            with self.lock:
+                self.batch_histogram[len(batch)] += 1
+                for _, enqueued, _ in batch:
+                    self.queue_delays.append((started - enqueued) * 1000)  # ms
+
+            try:
+                # One forward pass; the pipeline pads the batch to its longest member
+                with self.infer_lock:
+                    results = self.classifier(texts, batch_size=len(texts), truncation=True)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (text, _, future), result in zip(batch, results):
+                self._record(text, result)
+                future.set_result(result)
+
+    def _record(self, text, result):
+        if self.cache is not None:
+            self.cache.put(text, result)
+        if self.prefilter is not None:
+            self.prefilter.observe(text, result)
+
+    def stats(self):
+        with self.lock:
+            delays = sorted(self.queue_delays)
+            histogram = dict(sorted(self.batch_histogram.items()))
+
+        if not delays:
+            return {'batch_histogram': histogram, 'requests': 0}
+
+        return {
+            'batch_histogram': histogram,
+            'requests': sum(size * count for size, count in histogram.items()),
+            'avg_queue_delay': sum(delays) / len(delays),
+            'p95_queue_delay': delays[int(0.95 * (len(delays) - 1))],
+            'max_queue_delay': delays[-1]
+        }
@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import ThreatBlockchain, HASH_VERSION, calculate_hash_v2
+from ledger_store import LedgerStore
+
+
+# Writes a synthetic ledger straight to disk, bypassing checkpoints
+def build_ledger(path, blocks):
+    store = LedgerStore(path, fsync_every=10 ** 9, fsync_interval=10 ** 9)
+    previous_hash = '0'
+    for index in range(blocks + 1):
+        timestamp = f"2025-01-01 00:00:00.{index:06d}"
+        data = {
+            'incident_id': f"INC_{index}",
+            'text_hash': f"{index:016x}",
+            'threat_type': 'Abusive Language',
+            'severity': 'LOW',
+            'confidence': '61.00%',
+            'timestamp': '2025-01-01 00:00:00',
+            'username': f"user_{index % 1000}"
+        }
+        block_hash = calculate_hash_v2(index, timestamp, data, previous_hash)
+        store.append({
+            'index': index,
+            'version': HASH_VERSION,
+            'timestamp': timestamp,
+            'data': data,
+            'previous_hash': previous_hash,
+            'hash': block_hash
+        })
+        previous_hash = block_hash
+    store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serial vs process-parallel full ledger audit")
+    parser.add_argument('--blocks', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'ledger')
+        started = time.perf_counter()
+        build_ledger(path, args.blocks)
+        print(f"built {args.blocks} blocks in {time.perf_counter() - started:.1f}s")
+
+        chain = ThreatBlockchain(path=path)
+        serial = chain.audit_chain()
+        parallel = chain.audit_chain(parallel=args.workers)
+        chain.close()
+
+    for report in (serial, parallel):
+        print(f"workers={report['workers']:>3}  valid={report['valid']}  "
+              f"{report['seconds']:.2f}s  {report['blocks_per_sec']:,.0f} blocks/sec")
+    print(f"speedup: {serial['seconds'] / parallel['seconds']:.2f}x")
@@ -0,0 +1,37 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from blockchain import calculate_hash_v1, calculate_hash_v2
+
+
+SAMPLE = {
+    'incident_id': 'INC_42',
+    'username': 'test_user',
+    'text_hash': '9f86d081884c7d65',
+    'threat_type': 'Violent Threat',
+    'severity': 'HIGH',
+    'confidence': '97.31%',
+    'timestamp': '2025-01-01 12:00:00',
+    'platform': 'Instagram (Demo)'
+}
+
+
+def hashes_per_sec(fn, iterations):
+    previous_hash = '0' * 64
+    started = time.perf_counter()
+    for index in range(iterations):
+        previous_hash = fn(index, '2025-01-01 12:00:00.000000', SAMPLE, previous_hash)
+    return iterations / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Block hashing throughput per encoding version")
+    parser.add_argument('--iterations', type=int, default=200_000)
+    args = parser.parse_args()
+
+    for name, fn in (('v1 legacy concat', calculate_hash_v1), ('v2 canonical', calculate_hash_v2)):
+        print(f"{name:<18} {hashes_per_sec(fn, args.iterations):>12,.0f} hashes/sec")
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import LatencyHistogram
+
+
+COMMENTS = [
+    "Great post, thanks for sharing!",
+    "This is really helpful, I learned a lot",
+    "You are an idiot and everyone hates you",
+    "I know where you live, watch your back",
+    "Nice photo from the conference",
+    "Go back to where you came from",
+]
+
+
+# One keep-alive connection issuing requests back to back
+async def client(host, port, deadline, batch_size, histogram, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            if batch_size > 1:
+                path = '/classify/batch'
+                payload = {'items': [
+                    {'text': random.choice(COMMENTS), 'username': f"user_{random.randrange(1000)}"}
+                    for _ in range(batch_size)
+                ]}
+            else:
+                path = '/classify'
+                payload = {'text': random.choice(COMMENTS), 'username': f"user_{random.randrange(1000)}"}
+            body = json.dumps(payload).encode()
+
+            started = time.perf_counter_ns()
+            writer.write(
+                f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode().partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+
+            histogram.record(time.perf_counter_ns() - started)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def load_test(host, port, connections, seconds, batch_size):
+    histogram = LatencyHistogram()
+    statuses = Counter()
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, deadline, batch_size, histogram, statuses) for _ in range(connections)
+    ))
+    return histogram, statuses, time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Closed-loop load test against a running server.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--batch-size', type=int, default=1)
+    args = parser.parse_args()
+
+    histogram, statuses, elapsed = asyncio.run(
+        load_test(args.host, args.port, args.connections, args.seconds, args.batch_size)
+    )
+    print(f"requests:   {histogram.count} in {elapsed:.1f}s ({histogram.count / elapsed:,.0f} req/s, "
+          f"{histogram.count * args.batch_size / elapsed:,.0f} comments/s)")
+    print(f"statuses:   {dict(statuses)}")
+    if histogram.count:
+        for q in (50, 95, 99):
+            print(f"p{q}:        {histogram.percentile(q) / 1e6:.2f}ms")
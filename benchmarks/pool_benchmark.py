@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKENDS, DEFAULT_BACKEND, load_corpus
+from inference_pool import InferencePool
+
+
+def comments_per_sec(pool, texts, batch_size, rounds):
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)] * rounds
+    pool(batches[0], batch_size=batch_size, truncation=True)  # warm-up
+    started = time.perf_counter()
+    futures = [pool.submit(batch, batch_size=len(batch), truncation=True) for batch in batches]
+    for future in futures:
+        future.result()
+    return sum(len(batch) for batch in batches) / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inference throughput and memory per worker-process count")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument('--max-processes', type=int, default=os.cpu_count())
+    parser.add_argument('--threads-per-worker', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    baseline = None
+    processes = 1
+    while processes <= args.max_processes:
+        pool = InferencePool(args.backend, processes=processes, threads_per_worker=args.threads_per_worker)
+        rate = comments_per_sec(pool, texts, args.batch_size, args.rounds)
+        workers = pool.stats()['workers']
+        pool.close()
+
+        baseline = baseline or rate
+        rss = sum(w['rss_mb'] or 0 for w in workers)
+        pss = sum(w['pss_mb'] or 0 for w in workers)
+        print(f"{processes:>3} procs {rate:>10,.0f} comments/sec  {rate / baseline:>5.2f}x  "
+              f"workers RSS {rss:>8,.0f} MB  PSS {pss:>8,.0f} MB")
+        processes *= 2
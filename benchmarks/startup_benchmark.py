@@ -0,0 +1,31 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measured before anything else is imported, so every figure is a cold start
+started = time.perf_counter()
+import blockchain, batcher, verdict_cache, lexicon, prefilter, pattern_detector, near_duplicates, telemetry
+from backends import BACKENDS, DEFAULT_BACKEND, LazyClassifier
+app_imports_s = time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start breakdown: imports, weight loading, first inference")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    classifier = LazyClassifier(args.backend).start()
+    responsive_s = app_imports_s + time.perf_counter() - started
+
+    classifier.wait()
+    ready_s = app_imports_s + time.perf_counter() - started
+
+    print(f"{'app module imports':<22} {app_imports_s:>8.3f}s")
+    print(f"{'responsive (prompt)':<22} {responsive_s:>8.3f}s")
+    for name, seconds in classifier.timings.items():
+        print(f"{name[:-2].replace('_', ' '):<22} {seconds:>8.3f}s")
+    print(f"{'model ready':<22} {ready_s:>8.3f}s")
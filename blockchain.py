@@ -1,62 +1,507 @@
 import hashlib
+import hmac
 import json
+import logging
+import os
+import secrets
+import struct
+import threading
+import time
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
+from ledger_store import LedgerStore
+from ledger_index import LedgerIndex
+from merkle import leaf_hash, merkle_root, merkle_proof, verify_proof
+
+
+logger = logging.getLogger(__name__)
+
+HASH_VERSION = 2
+
+# Version 2 hashes a fixed binary layout: the index as a big-endian u64, then
+# length-prefixed timestamp, canonical (sorted-key, compact) data JSON and
+# previous hash, fed into a copy of a pre-seeded hashlib object
+V2_SEED = hashlib.sha256(b'SafeGuard block v2\n')
+U64 = struct.Struct('>Q')
+U32 = struct.Struct('>I')
+
+
+CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+
+
+def canonical_json(data):
+    return CANONICAL_ENCODER.encode(data).encode()
+
+
+def calculate_hash_v2(index, timestamp, data, previous_hash):
+    h = V2_SEED.copy()
+    h.update(U64.pack(index))
+    for field in (str(timestamp).encode(), canonical_json(data), str(previous_hash).encode()):
+        h.update(U32.pack(len(field)))
+        h.update(field)
+    return h.hexdigest()
+
+
+# Legacy (unversioned) blocks: string concatenation of json.dumps(data)
+def calculate_hash_v1(index, timestamp, data, previous_hash):
+    value = str(index) + str(timestamp) + json.dumps(data) + str(previous_hash)
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def block_hash(block):
+    if block.get('version', 1) >= 2:
+        return calculate_hash_v2(block['index'], block['timestamp'], block['data'], block['previous_hash'])
+    return calculate_hash_v1(block['index'], block['timestamp'], block['data'], block['previous_hash'])
+
+
+# Checks blocks in order against their predecessor's stored hash; returns
+# the position of the first broken block (counting from start) or None
+def check_blocks(blocks, previous_hash, start):
+    for i, current in enumerate(blocks, start):
+        if current['previous_hash'] != previous_hash:
+            return i
+        
+        if current['hash'] != block_hash(current):
+            return i
+        
+        # Batch blocks commit to their incidents through the Merkle root
+        if 'incidents' in current:
+            root = merkle_root([leaf_hash(incident) for incident in current['incidents']])
+            if root != current['data']['merkle_root']:
+                return i
+        previous_hash = current['hash']
+    
+    return None
+
+
+# Process-pool worker: opens its own read-only view of an on-disk ledger,
+# or receives the blocks directly for an in-memory chain
+def audit_range(task):
+    if 'path' in task:
+        store = LedgerStore(task['path'], readonly=True)
+        try:
+            previous_hash = store[task['start'] - 1]['hash']
+            blocks = (store[i] for i in range(task['start'], task['stop']))
+            return check_blocks(blocks, previous_hash, task['start'])
+        finally:
+            store.close()
+    return check_blocks(task['blocks'], task['previous_hash'], task['start'])
+
+
+def inside_directory(path, directory):
+    path = os.path.realpath(path)
+    directory = os.path.realpath(directory)
+    return os.path.commonpath([path, directory]) == directory
+
 
 class ThreatBlockchain:
-    def __init__(self):
-        self.chain = []
-        self.create_genesis_block()
+    def __init__(self, path=None, checkpoint_interval=1000, checkpoint_key=None, checkpoint_key_file=None,
+                 index_appends=True, readonly=False):
+        # With a path the chain lives in an append-only on-disk ledger,
+        # otherwise it is an in-memory list. readonly opens a snapshot of an
+        # existing ledger without taking the writer lock or touching its files.
+        self.path = path
+        self.readonly = readonly
+        if readonly and not (path and os.path.exists(os.path.join(path, 'blocks.dat'))):
+            raise FileNotFoundError(f"No ledger found at {path}")
+        self.checkpoint_key = self.load_checkpoint_key(checkpoint_key, checkpoint_key_file)
+        self.chain = LedgerStore(path, readonly=readonly) if path else []
+        self.checkpoint_interval = checkpoint_interval
+        self.checkpoints = self.load_checkpoints()
+        self.incident_index = LedgerIndex(self.chain)
+        self.lock = threading.RLock()
+        if len(self.chain) == 0:
+            if readonly:
+                self.close()
+                raise ValueError(f"Ledger at {path} has no blocks")
+            self.create_genesis_block()
+            # A fresh chain is indexed eagerly on append; a reopened one (or
+            # one opened with index_appends=False, e.g. for bulk writes) is
+            # indexed on its first query
+            if index_appends:
+                self.incident_index.catch_up()
+        
+        # Blocks up to verified_upto have been checked; verified_hash pins
+        # the hash of that block so later edits to it are noticed. A reopened
+        # ledger starts from its latest signed checkpoint.
+        checkpoint = self.latest_valid_checkpoint()
+        self.verified_upto = checkpoint['index'] if checkpoint else 0
+        self.verified_hash = self.chain[self.verified_upto]['hash']
     
     def create_genesis_block(self):
+        timestamp = str(datetime.now())
+        data = 'Genesis Block - SafeSpot AI Initialized'
         genesis_block = {
             'index': 0,
-            'timestamp': str(datetime.now()),
-            'data': 'Genesis Block - SafeSpot AI Initialized',
+            'version': HASH_VERSION,
+            'timestamp': timestamp,
+            'data': data,
             'previous_hash': '0',
-            'hash': self.calculate_hash(0, str(datetime.now()), 'Genesis Block', '0')
+            'hash': self.calculate_hash(0, timestamp, data, '0')
         }
         self.chain.append(genesis_block)
     
     def calculate_hash(self, index, timestamp, data, previous_hash):
-        value = str(index) + str(timestamp) + str(data) + str(previous_hash)
-        return hashlib.sha256(value.encode()).hexdigest()
+        return calculate_hash_v2(index, timestamp, data, previous_hash)
+    
+    # Legacy genesis blocks hashed different values than they store, so only
+    # versioned genesis blocks can be checked
+    def genesis_is_valid(self):
+        genesis = self.chain[0]
+        return genesis.get('version', 1) < 2 or genesis['hash'] == block_hash(genesis)
     
     def add_threat_block(self, threat_data):
-        previous_block = self.chain[-1]
-        index = len(self.chain)
-        timestamp = str(datetime.now())
-        previous_hash = previous_block['hash']
+        with self.lock:
+            previous_block = self.chain[-1]
+            index = len(self.chain)
+            timestamp = str(datetime.now())
+            previous_hash = previous_block['hash']
+            
+            block = {
+                'index': index,
+                'version': HASH_VERSION,
+                'timestamp': timestamp,
+                'data': threat_data,
+                'previous_hash': previous_hash,
+                'hash': self.calculate_hash(index, timestamp, threat_data, previous_hash)
+            }
+            
+            self.chain.append(block)
+            self.incident_index.add_block(block)
+            if index % self.checkpoint_interval == 0:
+                self.add_checkpoint(block)
+            return block
+    
+    # Logs many incidents as one block; the block hash covers only the Merkle
+    # root, and each incident stays provable through an inclusion proof
+    def add_threat_batch(self, incidents):
+        with self.lock:
+            previous_block = self.chain[-1]
+            index = len(self.chain)
+            timestamp = str(datetime.now())
+            previous_hash = previous_block['hash']
+            data = {
+                'batch': True,
+                'merkle_root': merkle_root([leaf_hash(incident) for incident in incidents]),
+                'incident_count': len(incidents)
+            }
+            
+            block = {
+                'index': index,
+                'version': HASH_VERSION,
+                'timestamp': timestamp,
+                'data': data,
+                'incidents': list(incidents),
+                'previous_hash': previous_hash,
+                'hash': self.calculate_hash(index, timestamp, data, previous_hash)
+            }
+            
+            self.chain.append(block)
+            self.incident_index.add_block(block)
+            if index % self.checkpoint_interval == 0:
+                self.add_checkpoint(block)
+            return block
+    
+    def locate_incident(self, incident_id):
+        return self.incident_index.locate(incident_id)
+    
+    # Indexed query over incidents, e.g. find(username='bob', severity='HIGH',
+    # since=datetime(...)); returns (matches, next_cursor) newest first
+    def find(self, username=None, threat_type=None, severity=None, since=None, until=None,
+             limit=50, cursor=None):
+        return self.incident_index.find(
+            username=username, threat_type=threat_type, severity=severity,
+            since=since, until=until, limit=limit, cursor=cursor
+        )
+    
+    def get_inclusion_proof(self, incident_id):
+        location = self.locate_incident(incident_id)
+        if location is None:
+            return None
         
-        block = {
-            'index': index,
-            'timestamp': timestamp,
-            'data': threat_data,
-            'previous_hash': previous_hash,
-            'hash': self.calculate_hash(index, timestamp, json.dumps(threat_data), previous_hash)
+        block_index, position = location
+        block = self.chain[block_index]
+        if position is None:
+            # Single-incident block: the block hash itself is the proof
+            return {
+                'incident': block['data'],
+                'block_index': block_index,
+                'block_hash': block['hash'],
+                'merkle_root': None,
+                'proof': []
+            }
+        
+        leaves = [leaf_hash(incident) for incident in block['incidents']]
+        return {
+            'incident': block['incidents'][position],
+            'block_index': block_index,
+            'block_hash': block['hash'],
+            'merkle_root': block['data']['merkle_root'],
+            'leaf_index': position,
+            'proof': merkle_proof(leaves, position)
         }
+    
+    # Checks a proof against this ledger: the incident hashes up to the
+    # Merkle root, and the root is what the stored block committed to
+    def verify_inclusion(self, proof):
+        block = self.chain[proof['block_index']]
+        if block_hash(block) != block['hash'] or block['hash'] != proof['block_hash']:
+            return False
+        if proof['merkle_root'] is None:
+            return block['data'] == proof['incident']
+        return (
+            block['data']['merkle_root'] == proof['merkle_root']
+            and verify_proof(leaf_hash(proof['incident']), proof['proof'], proof['merkle_root'])
+        )
+    
+    # Returns the first index in [start, stop) that fails verification, or None
+    def find_broken_block(self, start, stop):
+        blocks = (self.chain[i] for i in range(start, stop))
+        return check_blocks(blocks, self.chain[start - 1]['hash'], start)
+    
+    # Full audit split into ranges checked in a process pool. Each range only
+    # needs its predecessor's stored hash, so ranges are independent.
+    def audit_chain(self, parallel=None):
+        length = len(self.chain)
+        started = time.perf_counter()
         
-        self.chain.append(block)
-        return block
+        if not self.genesis_is_valid():
+            first_broken = 0
+        elif not parallel or parallel <= 1 or length < 2:
+            first_broken = self.find_broken_block(1, length)
+        else:
+            if isinstance(self.chain, LedgerStore):
+                self.chain.sync()
+            chunk = max(1, -(-(length - 1) // (parallel * 4)))
+            tasks = []
+            for start in range(1, length, chunk):
+                stop = min(start + chunk, length)
+                if isinstance(self.chain, LedgerStore):
+                    tasks.append({'path': self.path, 'start': start, 'stop': stop})
+                else:
+                    tasks.append({
+                        'start': start,
+                        'blocks': self.chain[start:stop],
+                        'previous_hash': self.chain[start - 1]['hash']
+                    })
+            with ProcessPoolExecutor(max_workers=parallel) as pool:
+                broken = [i for i in pool.map(audit_range, tasks) if i is not None]
+            first_broken = min(broken) if broken else None
+        
+        seconds = time.perf_counter() - started
+        self.last_audit = {
+            'valid': first_broken is None,
+            'first_broken': first_broken,
+            'blocks': length - 1,
+            'workers': parallel or 1,
+            'seconds': seconds,
+            'blocks_per_sec': (length - 1) / seconds if seconds else 0
+        }
+        return self.last_audit
     
-    def verify_chain(self):
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i-1]
-            
-            if current['previous_hash'] != previous['hash']:
+    # mode='incremental' checks only blocks appended since the last call,
+    # mode='checkpoint' resumes from the latest valid signed checkpoint and
+    # mode='full' re-verifies the whole ledger. parallel=N runs a full audit
+    # across N processes; its report is kept in last_audit.
+    def verify_chain(self, mode='incremental', parallel=None):
+        length = len(self.chain)
+        
+        if parallel:
+            if not self.audit_chain(parallel)['valid']:
                 return False
-            
-            calculated_hash = self.calculate_hash(
-                current['index'],
-                current['timestamp'],
-                json.dumps(current['data']),
-                current['previous_hash']
-            )
-            
-            if current['hash'] != calculated_hash:
+            start = length
+        elif mode == 'incremental':
+            if self.chain[self.verified_upto]['hash'] != self.verified_hash:
                 return False
+            start = self.verified_upto + 1
+        elif mode == 'checkpoint':
+            checkpoint = self.latest_valid_checkpoint()
+            start = checkpoint['index'] + 1 if checkpoint else 1
+        elif mode == 'full':
+            if not self.genesis_is_valid():
+                return False
+            start = 1
+        else:
+            raise ValueError(f"Unknown verify mode '{mode}'")
+        
+        if self.find_broken_block(start, length) is not None:
+            return False
         
+        self.verified_upto = length - 1
+        self.verified_hash = self.chain[length - 1]['hash']
         return True
     
+    # The signing key comes from the caller, SAFEGUARD_CHECKPOINT_KEY or a
+    # key file outside the ledger directory (SAFEGUARD_CHECKPOINT_KEY_FILE):
+    # whoever can edit the ledger must not be able to sign checkpoints. An
+    # on-disk ledger without a key keeps no checkpoints and trusts none, so
+    # a reopened chain is verified from genesis.
+    def load_checkpoint_key(self, key, key_file=None):
+        if key is None:
+            key = os.environ.get('SAFEGUARD_CHECKPOINT_KEY')
+        if key is None:
+            key_file = key_file or os.environ.get('SAFEGUARD_CHECKPOINT_KEY_FILE')
+            if key_file:
+                if self.path and inside_directory(key_file, self.path):
+                    raise ValueError("The checkpoint key must be stored outside the ledger directory")
+                with open(key_file, 'rb') as f:
+                    key = f.read().strip()
+        if key is not None:
+            if not key:
+                raise ValueError("The checkpoint key is empty")
+            return key.encode() if isinstance(key, str) else key
+        if not self.path:
+            # In-memory checkpoints never outlive the process
+            return secrets.token_bytes(32)
+        if self.readonly:
+            return None  # readers never sign
+        warnings.warn(
+            "No checkpoint key configured (SAFEGUARD_CHECKPOINT_KEY or SAFEGUARD_CHECKPOINT_KEY_FILE); "
+            "signed checkpoints are disabled and the ledger is verified in full when reopened"
+        )
+        return None
+    
+    def load_checkpoints(self):
+        if not self.path:
+            return []
+        checkpoint_path = os.path.join(self.path, 'checkpoints.jsonl')
+        if not os.path.exists(checkpoint_path):
+            return []
+        with open(checkpoint_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def sign_checkpoint(self, index, block_hash):
+        message = f"{index}:{block_hash}".encode()
+        return hmac.new(self.checkpoint_key, message, hashlib.sha256).hexdigest()
+    
+    def add_checkpoint(self, block):
+        if self.checkpoint_key is None:
+            return None
+        checkpoint = {
+            'index': block['index'],
+            'hash': block['hash'],
+            'signature': self.sign_checkpoint(block['index'], block['hash'])
+        }
+        self.checkpoints.append(checkpoint)
+        if self.path:
+            self.chain.sync()
+            with open(os.path.join(self.path, 'checkpoints.jsonl'), 'a') as f:
+                f.write(json.dumps(checkpoint) + '\n')
+        return checkpoint
+    
+    def latest_valid_checkpoint(self):
+        if self.checkpoint_key is None:
+            return None
+        for checkpoint in reversed(self.checkpoints):
+            if checkpoint['index'] >= len(self.chain):
+                continue
+            expected = self.sign_checkpoint(checkpoint['index'], checkpoint['hash'])
+            if not hmac.compare_digest(expected, checkpoint['signature']):
+                continue
+            if self.chain[checkpoint['index']]['hash'] == checkpoint['hash']:
+                return checkpoint
+        return None
+    
+    # Forces appended blocks to disk, e.g. before recording a resume point
+    def sync(self):
+        if isinstance(self.chain, LedgerStore):
+            self.chain.sync()
+    
+    def close(self):
+        if isinstance(self.chain, LedgerStore):
+            self.chain.close()
+    
     def get_threat_blocks(self):
-        return [block for block in self.chain if block['index'] > 0]
\ No newline at end of file
+        return self.chain[1:]
+
+
+# Collects incidents over a short window and logs them as one Merkle batch
+# block, flushing when the window closes or max_incidents is reached. add()
+# returns a Future resolved with (block, leaf position) once the incident is
+# on the ledger; incidents without an incident_id get INC_<block>_<leaf>.
+# A failed flush is logged and retried with the same incidents, and close()
+# stops the flush thread after a final flush.
+class IncidentBatcher:
+    def __init__(self, chain, window_seconds=2.0, max_incidents=1000, auto_flush=True):
+        self.chain = chain
+        self.window_seconds = window_seconds
+        self.max_incidents = max_incidents
+        self.pending = []
+        self.futures = []
+        self.failed_batch = None  # incidents of the last attempt, if it raised
+        self.opened_at = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        if auto_flush:
+            self.thread = threading.Thread(target=self._flush_loop, name="safeguard-incident-batcher", daemon=True)
+            self.thread.start()
+    
+    def add(self, threat_data):
+        future = Future()
+        with self.lock:
+            if self.stopped.is_set():
+                raise RuntimeError("IncidentBatcher is closed")
+            if not self.pending:
+                self.opened_at = time.monotonic()
+            self.pending.append(threat_data)
+            self.futures.append(future)
+            if len(self.pending) >= self.max_incidents or time.monotonic() - self.opened_at >= self.window_seconds:
+                self._flush()
+        return future
+    
+    def flush(self):
+        with self.lock:
+            return self._flush()
+    
+    def _flush(self):
+        if not self.pending:
+            return None
+        try:
+            with self.chain.lock:
+                tail = self.chain.chain[-1]
+                if self.failed_batch is not None and tail.get('incidents') == self.failed_batch:
+                    # The failed attempt got as far as appending its block
+                    block = tail
+                else:
+                    index = len(self.chain.chain)
+                    self.failed_batch = [
+                        incident if 'incident_id' in incident else dict(incident, incident_id=f"INC_{index}_{position}")
+                        for position, incident in enumerate(self.pending)
+                    ]
+                    block = self.chain.add_threat_batch(self.failed_batch)
+        except Exception:
+            logger.exception("Logging a batch of %d incidents failed; retrying on the next flush", len(self.pending))
+            return None
+        
+        # Incidents added after a failed attempt stay pending for the next block
+        logged = len(self.failed_batch)
+        futures = self.futures[:logged]
+        self.pending = self.pending[logged:]
+        self.futures = self.futures[logged:]
+        self.failed_batch = None
+        for position, future in enumerate(futures):
+            future.set_result((block, position))
+        return block
+    
+    def _flush_loop(self):
+        while not self.stopped.wait(self.window_seconds / 2):
+            with self.lock:
+                if self.pending and time.monotonic() - self.opened_at >= self.window_seconds:
+                    self._flush()
+    
+    # Flushes what is pending; incidents that still can't be logged fail
+    # their futures instead of waiting forever
+    def close(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.lock:
+            self._flush()
+            error = RuntimeError(f"IncidentBatcher closed with {len(self.pending)} incidents unlogged")
+            for future in self.futures:
+                future.set_exception(error)
+            self.pending = []
+            self.futures = []
+            self.failed_batch = None
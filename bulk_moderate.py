@@ -0,0 +1,297 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import uuid
+
+from blockchain import ThreatBlockchain
+from backends import load_classifier, model_identity
+from batcher import BatchScheduler
+from verdict_cache import VerdictCache
+from lexicon import Lexicon
+from verdicts import build_verdict
+from prefilter import BenignPrefilter
+from timestamps import capture
+from inference_pool import InferencePool
+
+
+# An input record that could not be parsed; it gets an error verdict and
+# the run moves on
+class MalformedRecord:
+    def __init__(self, offset, error):
+        self.offset = offset  # byte offset of the record in the input
+        self.error = error
+
+
+# Readers work on a binary file and yield (end offset, record) so a
+# checkpoint can seek straight back to the next unread record
+def read_jsonl(stream):
+    while True:
+        start = stream.tell()
+        line = stream.readline()
+        if not line:
+            return
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = MalformedRecord(start, f"invalid JSON: {e}")
+        else:
+            if not isinstance(record, dict):
+                record = MalformedRecord(start, f"expected a JSON object, got {type(record).__name__}")
+        yield stream.tell(), record
+
+
+def read_csv_row(stream):
+    # A quoted field may span lines; keep reading until quotes balance
+    raw = stream.readline()
+    while raw and raw.count(b'"') % 2:
+        more = stream.readline()
+        if not more:
+            break
+        raw += more
+    if not raw:
+        return None
+    return next(csv.reader(io.StringIO(raw.decode('utf-8-sig'))), [])
+
+
+def read_csv(stream, header):
+    while True:
+        start = stream.tell()
+        try:
+            row = read_csv_row(stream)
+        except (ValueError, csv.Error) as e:
+            yield stream.tell(), MalformedRecord(start, f"unreadable CSV row: {e}")
+            continue
+        if row is None:
+            return
+        if row:
+            yield stream.tell(), dict(zip(header, row))
+
+
+def batched(records, size):
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BulkModerator:
+    def __init__(self, ledger_path="ledger", batch_size=256, inference_processes=0):
+        self.lexicon = Lexicon()
+        self.pool = InferencePool(processes=inference_processes) if inference_processes else None
+        self.scheduler = BatchScheduler(
+            self.pool or load_classifier(), max_batch_size=16,
+            cache=VerdictCache(max_entries=10000, ttl_seconds=24 * 3600, namespace=model_identity()),
+            prefilter=BenignPrefilter(threshold=0.97, lexicon=self.lexicon)
+        )
+        # Write-only here: indexing every logged incident would grow memory
+        # with the number of threats found
+        self.chain = ThreatBlockchain(path=ledger_path, index_appends=False)
+        self.batch_size = batch_size
+
+    # Classifies one batch; returns its verdicts and the incidents to log.
+    # Incident ids are derived from the run and record number. Malformed
+    # records get an error verdict with their byte offset instead.
+    def moderate_batch(self, batch, state, text_field, user_field, id_field):
+        texts = [
+            str(record.get(text_field) or '') for _, record in batch if not isinstance(record, MalformedRecord)
+        ]
+        classified = iter(zip(texts, self.scheduler.classify_many(texts)))
+
+        verdicts, incidents = [], []
+        records = state['records']
+        for _, record in batch:
+            records += 1
+            if isinstance(record, MalformedRecord):
+                verdicts.append({'record': records, 'offset': record.offset, 'error': record.error})
+                continue
+            text, result = next(classified)
+            verdict = build_verdict(text, result, self.lexicon)
+            verdict['record'] = records
+            if id_field in record:
+                verdict['id'] = record[id_field]
+            if verdict['is_threat']:
+                incident = {
+                    'incident_id': f"BULK_{state['run_id']}_{records}",
+                    'text_hash': hashlib.sha256(text.encode()).hexdigest()[:16],
+                    'threat_type': verdict['threat_type'],
+                    'severity': verdict['severity'],
+                    'confidence': f"{verdict['confidence']:.2%}",
+                    **capture(),
+                    'username': record.get(user_field, 'unknown')
+                }
+                verdict['incident_id'] = incident['incident_id']
+                incidents.append(incident)
+            verdicts.append(verdict)
+        return verdicts, incidents
+
+    # Appends the batch block recorded in a write-ahead checkpoint, unless
+    # the ledger already holds it
+    def commit_pending(self, state, checkpoint_path):
+        pending = state['pending']
+        index = pending['block_index']
+        if len(self.chain.chain) == index:
+            self.chain.add_threat_batch(pending['incidents'])
+            self.chain.sync()
+        elif len(self.chain.chain) < index or self.chain.chain[index].get('incidents') != pending['incidents']:
+            raise RuntimeError(f"Ledger block {index} does not match checkpoint {checkpoint_path}")
+        state['pending'] = None
+        save_checkpoint(checkpoint_path, state)
+
+    def run(self, input_path, output_path, checkpoint_path, fmt, text_field="text", user_field="username",
+            id_field="id", restart=False, progress_interval=5.0):
+        state = None if restart else load_checkpoint(checkpoint_path)
+        input_size = os.path.getsize(input_path)
+        if state is not None and state['input'] != os.path.abspath(input_path):
+            raise ValueError(f"Checkpoint {checkpoint_path} belongs to {state['input']}")
+        if state is None:
+            state = {
+                'input': os.path.abspath(input_path),
+                'run_id': uuid.uuid4().hex[:8],
+                'offset': 0,
+                'records': 0,
+                'threats': 0,
+                'errors': 0,
+                'output_bytes': 0,
+                'header': None,
+                'pending': None
+            }
+            # The run id must be durable before any incident carries it
+            save_checkpoint(checkpoint_path, state)
+        else:
+            print(f"Resuming after record {state['records']} ({state['offset']:,} of {input_size:,} bytes)", file=sys.stderr)
+            state.setdefault('errors', 0)  # checkpoints written before malformed records were counted
+            if state.get('pending'):
+                self.commit_pending(state, checkpoint_path)
+
+        started = time.perf_counter()
+        resumed_records = state['records']
+        last_report = started
+
+        with open(input_path, 'rb') as stream, open(output_path, 'ab') as output:
+            # Drop verdict lines written after the last checkpoint
+            output.truncate(state['output_bytes'])
+            output.seek(state['output_bytes'])
+
+            if fmt == 'csv':
+                if state['header'] is None:
+                    state['header'] = read_csv_row(stream)
+                    state['offset'] = stream.tell()
+                    save_checkpoint(checkpoint_path, state)
+                stream.seek(state['offset'])
+                records = read_csv(stream, state['header'])
+            else:
+                stream.seek(state['offset'])
+                records = read_jsonl(stream)
+
+            # Per batch: verdicts are written and fsynced, then a write-ahead
+            # checkpoint records the batch's incidents and block index before
+            # the block is appended. A crash before that checkpoint replays
+            # the batch with nothing logged; a crash after it is finished from
+            # the checkpoint, so replay never depends on re-classifying.
+            for batch in batched(records, self.batch_size):
+                verdicts, incidents = self.moderate_batch(batch, state, text_field, user_field, id_field)
+                block_index = len(self.chain.chain)
+                for verdict in verdicts:
+                    if 'incident_id' in verdict:
+                        verdict['block_index'] = block_index
+                output.write(''.join(json.dumps(v) + '\n' for v in verdicts).encode())
+                output.flush()
+                os.fsync(output.fileno())
+
+                state['offset'] = batch[-1][0]
+                state['records'] += len(batch)
+                state['threats'] += len(incidents)
+                state['errors'] += sum(1 for verdict in verdicts if 'error' in verdict)
+                state['output_bytes'] = output.tell()
+                if incidents:
+                    state['pending'] = {'block_index': block_index, 'incidents': incidents}
+                    save_checkpoint(checkpoint_path, state)
+                    self.commit_pending(state, checkpoint_path)
+                else:
+                    save_checkpoint(checkpoint_path, state)
+
+                now = time.perf_counter()
+                if now - last_report >= progress_interval:
+                    last_report = now
+                    rate = (state['records'] - resumed_records) / (now - started)
+                    print(
+                        f"{state['records']:,} records | {state['threats']:,} threats | {state['errors']:,} malformed | "
+                        f"{state['offset'] / max(input_size, 1):.1%} | {rate:,.0f} records/s",
+                        file=sys.stderr
+                    )
+
+        elapsed = time.perf_counter() - started
+        return {
+            'records': state['records'],
+            'threats': state['threats'],
+            'errors': state['errors'],
+            'seconds': elapsed,
+            'records_per_sec': (state['records'] - resumed_records) / elapsed if elapsed else 0.0
+        }
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        self.chain.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moderate a JSONL or CSV comment dump in batches, resumably")
+    parser.add_argument('input')
+    parser.add_argument('--output', help="verdicts JSONL (default: <input>.verdicts.jsonl)")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help="default: from the file extension")
+    parser.add_argument('--text-field', default='text')
+    parser.add_argument('--user-field', default='username')
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--ledger', default="ledger")
+    parser.add_argument('--inference-processes', type=int, default=0, help="fork this many model workers (0: in-process)")
+    parser.add_argument('--restart', action='store_true', help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    output_path = args.output or args.input + '.verdicts.jsonl'
+    checkpoint_path = args.checkpoint or output_path + '.checkpoint'
+    fmt = args.format or ('csv' if args.input.lower().endswith('.csv') else 'jsonl')
+    if args.restart and os.path.exists(output_path):
+        os.remove(output_path)
+
+    moderator = BulkModerator(
+        ledger_path=args.ledger, batch_size=args.batch_size, inference_processes=args.inference_processes
+    )
+    try:
+        report = moderator.run(
+            args.input, output_path, checkpoint_path, fmt, text_field=args.text_field,
+            user_field=args.user_field, id_field=args.id_field, restart=args.restart
+        )
+    finally:
+        moderator.close()
+    for key, value in report.items():
+        print(f"{key}: {value}")
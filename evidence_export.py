@@ -0,0 +1,180 @@
+import argparse
+import csv
+import io
+import json
+import sys
+
+from blockchain import ThreatBlockchain
+from ledger_index import block_incidents
+from merkle import leaf_hash, merkle_levels, proof_from_levels
+from timestamps import record_display_time
+
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'parquet')
+MIME_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson', 'parquet': 'application/vnd.apache.parquet'}
+EXPORT_COLUMNS = [
+    'block_index', 'block_timestamp', 'block_hash', 'previous_hash', 'hash_version',
+    'leaf_index', 'merkle_root', 'incident_id', 'username', 'threat_type', 'severity',
+    'confidence', 'text_hash', 'timestamp_ns', 'time', 'platform'
+]
+
+
+# Walks the ledger a chunk of blocks at a time and yields one row per
+# incident with the block fields needed to check it against the chain. With
+# include_proof, batch incidents carry their Merkle path to merkle_root;
+# single-incident blocks are proven by block_hash itself.
+def iter_evidence(chain, include_proof=False, chunk_blocks=32, start=1):
+    stop = len(chain.chain)  # blocks appended during the export are left out
+    for chunk_start in range(start, stop, chunk_blocks):
+        for block in chain.chain[chunk_start:min(chunk_start + chunk_blocks, stop)]:
+            levels = None
+            if include_proof and 'incidents' in block:
+                levels = merkle_levels([leaf_hash(incident) for incident in block['incidents']])
+            for position, incident in block_incidents(block):
+                row = {
+                    'block_index': block['index'],
+                    'block_timestamp': block['timestamp'],
+                    'block_hash': block['hash'],
+                    'previous_hash': block['previous_hash'],
+                    'hash_version': block.get('version', 1),
+                    'leaf_index': position,
+                    'merkle_root': block['data'].get('merkle_root') if position is not None else None,
+                    'incident_id': incident.get('incident_id'),
+                    'username': incident.get('username'),
+                    'threat_type': incident.get('threat_type'),
+                    'severity': incident.get('severity'),
+                    'confidence': incident.get('confidence'),
+                    'text_hash': incident.get('text_hash'),
+                    'timestamp_ns': incident.get('timestamp_ns'),
+                    'time': record_display_time(incident),
+                    'platform': incident.get('platform')
+                }
+                if include_proof:
+                    row['proof'] = proof_from_levels(levels, position) if position is not None else []
+                yield row
+
+
+def chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_csv(rows, include_proof=False, chunk_rows=1000):
+    columns = EXPORT_COLUMNS + (['proof'] if include_proof else [])
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for chunk in chunked(rows, chunk_rows):
+        for row in chunk:
+            if include_proof:
+                row = dict(row, proof=json.dumps(row['proof'], separators=(',', ':')))
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_jsonl(rows, chunk_rows=1000):
+    for chunk in chunked(rows, chunk_rows):
+        yield ''.join(json.dumps(row) + '\n' for row in chunk).encode()
+
+
+# Write-only file object that hands back whatever pyarrow has written so far
+class ChunkSink(io.RawIOBase):
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+# One Parquet row group per chunk; only the current chunk and its encoded
+# bytes are ever held in memory
+def export_parquet(rows, include_proof=False, chunk_rows=10000):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export needs pyarrow: pip install pyarrow") from e
+
+    fields = [
+        ('block_index', pa.int64()), ('block_timestamp', pa.string()), ('block_hash', pa.string()),
+        ('previous_hash', pa.string()), ('hash_version', pa.int64()), ('leaf_index', pa.int64()),
+        ('merkle_root', pa.string()), ('incident_id', pa.string()), ('username', pa.string()),
+        ('threat_type', pa.string()), ('severity', pa.string()), ('confidence', pa.string()),
+        ('text_hash', pa.string()), ('timestamp_ns', pa.int64()), ('time', pa.string()), ('platform', pa.string())
+    ]
+    if include_proof:
+        fields.append(('proof', pa.string()))
+    schema = pa.schema(fields)
+
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    for chunk in chunked(rows, chunk_rows):
+        if include_proof:
+            chunk = [dict(row, proof=json.dumps(row['proof'], separators=(',', ':'))) for row in chunk]
+        writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# Generator of encoded chunks for the whole ledger in the given format
+def export_evidence(chain, fmt='csv', include_proof=False):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', choose one of {', '.join(EXPORT_FORMATS)}")
+    rows = iter_evidence(chain, include_proof=include_proof)
+    if fmt == 'csv':
+        return export_csv(rows, include_proof=include_proof)
+    if fmt == 'jsonl':
+        return export_jsonl(rows)
+    return export_parquet(rows, include_proof=include_proof)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream the evidence ledger to CSV, JSONL or Parquet")
+    parser.add_argument('--ledger', default="ledger")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+    parser.add_argument('--output', help="default: stdout")
+    parser.add_argument('--proofs', action='store_true', help="include Merkle inclusion proofs")
+    args = parser.parse_args()
+
+    # A read-only snapshot: never creates a ledger or repairs a live writer's tail
+    try:
+        chain = ThreatBlockchain(path=args.ledger, readonly=True)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    try:
+        output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        try:
+            for data in export_evidence(chain, args.format, include_proof=args.proofs):
+                output.write(data)
+        finally:
+            if args.output:
+                output.close()
+    finally:
+        chain.close()
@@ -0,0 +1,93 @@
+import threading
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta, timezone
+
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+# Fields zeroed to get the start of the local minute, hour and day
+TRUNCATE = {
+    'minute': {'second': 0, 'microsecond': 0},
+    'hour': {'minute': 0, 'second': 0, 'microsecond': 0},
+    'day': {'hour': 0, 'minute': 0, 'second': 0, 'microsecond': 0}
+}
+RETENTION = {'minute': 24 * 60, 'hour': 90 * 24, 'day': 10 * 365}
+
+
+# Running counts per threat type, severity and time bucket, updated as each
+# incident is appended so the dashboard never rescans incidents. Minute, hour
+# and day buckets are kept side by side (oldest dropped past RETENTION), and
+# bucket edges follow local time, including DST changes, so hour buckets
+# start on local hours and day rollups at local midnight. Pass
+# utc_offset_seconds to bucket by a fixed offset instead.
+class IncidentAggregates:
+    def __init__(self, retention=RETENTION, utc_offset_seconds=None):
+        self.tz = None if utc_offset_seconds is None else timezone(timedelta(seconds=int(utc_offset_seconds)))
+        self.retention = retention
+        self.total = 0
+        self.counts = {'threat_type': Counter(), 'severity': Counter()}
+        self.buckets = {resolution: OrderedDict() for resolution in RESOLUTIONS}  # bucket start -> count
+        self.lock = threading.Lock()
+
+    # Epoch seconds of the start of the local bucket holding epoch_seconds;
+    # the offset is looked up at that instant, not fixed at startup
+    def bucket_start(self, epoch_seconds, resolution):
+        return self.bucket_starts(epoch_seconds)[resolution]
+
+    def bucket_starts(self, epoch_seconds):
+        local = datetime.fromtimestamp(int(epoch_seconds), self.tz)
+        return {resolution: int(local.replace(**fields).timestamp()) for resolution, fields in TRUNCATE.items()}
+
+    def add(self, threat_type, severity, timestamp_ns):
+        starts = self.bucket_starts(timestamp_ns // 1_000_000_000)
+        with self.lock:
+            self.total += 1
+            self.counts['threat_type'][threat_type] += 1
+            self.counts['severity'][severity] += 1
+            for resolution, buckets in self.buckets.items():
+                start = starts[resolution]
+                if start in buckets:
+                    buckets[start] += 1
+                    continue
+                # Late arrivals for buckets already dropped are not counted
+                if len(buckets) >= self.retention[resolution] and start < next(iter(buckets)):
+                    continue
+                buckets[start] = 1
+                if len(buckets) > self.retention[resolution]:
+                    buckets.popitem(last=False)
+
+    # Point-in-time copy of the counters, used as a view cursor: passing it
+    # back as `since` reports only what was added afterwards
+    def snapshot(self):
+        starts = self.bucket_starts(datetime.now().timestamp())
+        with self.lock:
+            current = {}
+            for resolution, buckets in self.buckets.items():
+                start = starts[resolution]
+                current[resolution] = (start, buckets.get(start, 0))
+            return {
+                'total': self.total,
+                'counts': {field: dict(counter) for field, counter in self.counts.items()},
+                'buckets': current
+            }
+
+    def count(self, since=None):
+        with self.lock:
+            return self.total - (since['total'] if since else 0)
+
+    # Counts per value of 'threat_type' or 'severity', largest first
+    def breakdown(self, field, since=None):
+        with self.lock:
+            counts = Counter(self.counts[field])
+        if since:
+            counts.subtract(since['counts'][field])
+        return [(value, count) for value, count in counts.most_common() if count > 0]
+
+    # [(bucket start epoch seconds, count)] in time order
+    def timeline(self, resolution='minute', since=None):
+        with self.lock:
+            series = sorted(self.buckets[resolution].items())
+        if since:
+            first, already_counted = since['buckets'][resolution]
+            series = [(start, count - already_counted if start == first else count)
+                      for start, count in series if start >= first]
+        return [(start, count) for start, count in series if count > 0]
@@ -0,0 +1,145 @@
+import threading
+
+import numpy as np
+
+
+SEVERITIES = ('LOW', 'MEDIUM', 'HIGH')
+
+
+# Maps labels to small integer codes; codes never change once assigned
+class Interner:
+    def __init__(self, labels=()):
+        self.labels = []
+        self.codes = {}
+        for label in labels:
+            self.code(label)
+
+    def code(self, label):
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+
+# Columnar ring buffer of blocked incidents with fixed dtypes. Every row is
+# written twice, at slot i and i + capacity, so the retained rows are always
+# one contiguous slice and views never need a copy.
+class IncidentStore:
+    def __init__(self, capacity=100_000, store_text=True):
+        self.capacity = capacity
+        self.store_text = store_text
+        self.threat_types = Interner()
+        self.severities = Interner(SEVERITIES)
+        self.usernames = Interner()
+        self.lock = threading.RLock()
+
+        size = 2 * capacity
+        self.columns = {
+            'timestamp_ns': np.zeros(size, dtype=np.int64),
+            'block_index': np.zeros(size, dtype=np.int64),
+            'confidence': np.zeros(size, dtype=np.float32),
+            'threat_type': np.zeros(size, dtype=np.uint16),
+            'severity': np.zeros(size, dtype=np.uint8),
+            'username': np.zeros(size, dtype=np.uint32),
+        }
+        self.texts = np.empty(size, dtype=object) if store_text else None
+        self.total = 0  # rows ever appended
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, username, threat_type, severity, confidence, timestamp_ns, block_index=-1, text=None):
+        with self.lock:
+            row = {
+                'timestamp_ns': timestamp_ns,
+                'block_index': block_index,
+                'confidence': confidence,
+                'threat_type': self.threat_types.code(threat_type),
+                'severity': self.severities.code(severity),
+                'username': self.usernames.code(username),
+            }
+            slot = self.total % self.capacity
+            for name, value in row.items():
+                column = self.columns[name]
+                column[slot] = value
+                column[slot + self.capacity] = value
+            if self.texts is not None:
+                self.texts[slot] = text
+                self.texts[slot + self.capacity] = text
+            self.total += 1
+
+    # Slot range of the retained rows whose sequence number (0-based append
+    # order) is at least `since`
+    def _window(self, since=0):
+        first = max(self.total - len(self), since)
+        start = first % self.capacity
+        return start, start + max(self.total - first, 0)
+
+    def _matching_slots(self, start, stop, username):
+        if username is None:
+            return np.arange(start, stop)
+        code = self.usernames.codes.get(username)
+        if code is None:
+            return np.arange(0)
+        return start + np.flatnonzero(self.columns['username'][start:stop] == code)
+
+    def count(self, since=0, username=None):
+        with self.lock:
+            start, stop = self._window(since)
+            return len(self._matching_slots(start, stop, username)) if username is not None else stop - start
+
+    # NumPy views of the retained rows, oldest first. Views are zero-copy, so
+    # rows may be overwritten once `capacity` further rows are appended.
+    def arrays(self, since=0):
+        with self.lock:
+            start, stop = self._window(since)
+            views = {name: column[start:stop] for name, column in self.columns.items()}
+            if self.texts is not None:
+                views['text'] = self.texts[start:stop]
+            return views
+
+    def decode(self, name, codes):
+        interner = {'threat_type': self.threat_types, 'severity': self.severities, 'username': self.usernames}[name]
+        return np.asarray(interner.labels, dtype=object)[codes]
+
+    # Consistent snapshot (copied under the lock) as a DataFrame with categoricals
+    def to_frame(self, since=0):
+        import pandas as pd
+
+        with self.lock:
+            views = {name: view.copy() for name, view in self.arrays(since).items()}
+            threat_types = list(self.threat_types.labels) or ['']
+            severities = list(self.severities.labels)
+            usernames = list(self.usernames.labels) or ['']
+        frame = {
+            'timestamp_ns': views['timestamp_ns'],
+            'block_index': views['block_index'],
+            'confidence': views['confidence'],
+            'threat_type': pd.Categorical.from_codes(views['threat_type'], threat_types),
+            'severity': pd.Categorical.from_codes(views['severity'], severities),
+            'username': pd.Categorical.from_codes(views['username'], usernames),
+        }
+        if 'text' in views:
+            frame['text'] = views['text']
+        return pd.DataFrame(frame, copy=False)
+
+    # Last n incidents as plain dicts, for rendering a handful of cards
+    def tail(self, n, since=0, username=None):
+        with self.lock:
+            start, stop = self._window(since)
+            records = []
+            for slot in self._matching_slots(start, stop, username)[-n:] if n else []:
+                records.append({
+                    'timestamp_ns': int(self.columns['timestamp_ns'][slot]),
+                    'block_index': int(self.columns['block_index'][slot]),
+                    'confidence': float(self.columns['confidence'][slot]),
+                    'threat_type': self.threat_types.labels[self.columns['threat_type'][slot]],
+                    'severity': self.severities.labels[self.columns['severity'][slot]],
+                    'username': self.usernames.labels[self.columns['username'][slot]],
+                    'text': self.texts[slot] if self.texts is not None else None
+                })
+            return records
+
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
@@ -0,0 +1,239 @@
+import gc
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+
+from backends import DEFAULT_BACKEND, load_classifier
+
+
+logger = logging.getLogger(__name__)
+
+# Set in the parent just before forking; forked workers inherit the already
+# loaded model, so weight pages are shared copy-on-write instead of copied
+_shared_classifier = None
+
+
+# CPUs this process may run on: under a cpuset (docker --cpuset-cpus, the
+# Kubernetes static CPU manager) these are not 0..cpu_count-1
+def usable_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _pin_threads(threads, cpus):
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            # Unpinned is slower, not wrong; keep the worker
+            logger.warning("Could not pin inference worker to CPUs %s: %s", sorted(cpus), e)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already fixed for this process
+
+
+def _worker_main(conn, backend, threads, cpus):
+    _pin_threads(threads, cpus)
+    # ONNX Runtime sessions don't survive a fork, so those workers load their own
+    classifier = _shared_classifier or load_classifier(backend)
+    while True:
+        task = conn.recv()
+        if task is None:
+            break
+        task_id, texts, kwargs = task
+        try:
+            conn.send((task_id, classifier(texts, **kwargs), None))
+        except Exception as e:
+            conn.send((task_id, None, repr(e)))
+
+
+def _rss_and_pss_mb(pid):
+    # Linux only: PSS splits shared pages between the processes mapping them
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if value.strip().endswith('kB'):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        return None, None
+    return fields.get('Rss'), fields.get('Pss')
+
+
+# Process pool with the classifier's call contract: pool(texts, batch_size=...,
+# truncation=...). The parent loads the weights once and forks the workers,
+# each pinned to its own cores and intra-op thread count; every batch goes to
+# the worker with the fewest batches outstanding. Results come back on each
+# worker's own pipe, so a worker that dies can't wedge the others; its
+# batches fail and it takes no new ones.
+class InferencePool:
+    def __init__(self, backend=DEFAULT_BACKEND, processes=None, threads_per_worker=1, pin_cpus=True, classifier=None):
+        global _shared_classifier
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("InferencePool needs the fork start method to share the model")
+        ctx = multiprocessing.get_context('fork')
+        cpus = usable_cpus()
+        self.processes = processes or max(1, len(cpus) // threads_per_worker)
+        self.concurrency = self.processes
+        # Fast tokenizers warn (and can deadlock) if their thread pool predates the fork
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+        if classifier is None and backend != 'onnx':
+            # Weights only; running inference here first would start thread
+            # pools that don't survive the fork
+            classifier = load_classifier(backend)
+        _shared_classifier = classifier
+
+        self.conns = []
+        self.send_locks = []
+        self.workers = []
+        self.outstanding = [0] * self.processes
+        self.completed = [0] * self.processes
+        self.futures = {}
+        self.assigned = [set() for _ in range(self.processes)]  # task ids each worker holds
+        self.dead = set()
+        self.closing = False
+        self.task_ids = itertools.count()
+        self.lock = threading.Lock()
+
+        # Keep the GC from touching (and so copying) inherited pages
+        gc.freeze()
+        try:
+            for index in range(self.processes):
+                worker_cpus = None
+                if pin_cpus and self.processes * threads_per_worker <= len(cpus):
+                    worker_cpus = set(cpus[index * threads_per_worker:(index + 1) * threads_per_worker])
+                parent_conn, child_conn = ctx.Pipe()
+                worker = ctx.Process(
+                    target=_worker_main, name=f"safeguard-inference-{index}", daemon=True,
+                    args=(child_conn, backend, threads_per_worker, worker_cpus)
+                )
+                worker.start()
+                child_conn.close()
+                self.conns.append(parent_conn)
+                self.send_locks.append(threading.Lock())
+                self.workers.append(worker)
+        finally:
+            _shared_classifier = None
+
+        self.collector = threading.Thread(target=self._collect, daemon=True)
+        self.collector.start()
+
+    def submit(self, texts, **kwargs):
+        future = Future()
+        with self.lock:
+            alive = [index for index in range(self.processes) if index not in self.dead]
+            if not alive:
+                raise RuntimeError("No inference workers left alive")
+            index = min(alive, key=self.outstanding.__getitem__)
+            self.outstanding[index] += 1
+            task_id = next(self.task_ids)
+            self.futures[task_id] = future
+            self.assigned[index].add(task_id)
+        try:
+            with self.send_locks[index]:
+                self.conns[index].send((task_id, list(texts), kwargs))
+        except OSError:
+            pass  # worker died since dispatch; the collector fails the future
+        return future
+
+    def __call__(self, texts, **kwargs):
+        return self.submit(texts, **kwargs).result()
+
+    # Waits on every worker's pipe and process sentinel; runs until all
+    # workers have exited
+    def _collect(self):
+        waiting = {}
+        for index, (conn, worker) in enumerate(zip(self.conns, self.workers)):
+            waiting[conn] = index
+            waiting[worker.sentinel] = index
+        while waiting:
+            for ready in wait(list(waiting)):
+                index = waiting.get(ready)
+                if index is None:
+                    continue  # reaped earlier in this round
+                if ready is self.conns[index]:
+                    try:
+                        self._resolve(index, *ready.recv())
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                self._reap(index)
+                del waiting[self.conns[index]], waiting[self.workers[index].sentinel]
+
+    def _resolve(self, index, task_id, outputs, error):
+        with self.lock:
+            future = self.futures.pop(task_id, None)
+            if future is None:
+                return
+            self.assigned[index].discard(task_id)
+            self.outstanding[index] -= 1
+            self.completed[index] += 1
+        if error is None:
+            future.set_result(outputs)
+        else:
+            future.set_exception(RuntimeError(f"Inference worker {index} failed: {error}"))
+
+    # Takes an exited worker out of rotation and fails the batches it still
+    # held (OOM kill, crash in a native kernel, ...) so callers don't wait
+    # forever
+    def _reap(self, index):
+        conn, worker = self.conns[index], self.workers[index]
+        try:
+            while conn.poll():  # results it sent before dying
+                self._resolve(index, *conn.recv())
+        except (EOFError, OSError):
+            pass
+        worker.join(timeout=1)
+        with self.lock:
+            self.dead.add(index)
+            lost = [self.futures.pop(task_id) for task_id in self.assigned[index]]
+            self.assigned[index].clear()
+            self.outstanding[index] = 0
+        if self.closing:
+            error = RuntimeError("Inference pool closed")
+        else:
+            error = RuntimeError(f"Inference worker {index} exited with code {worker.exitcode}")
+        for future in lost:
+            future.set_exception(error)
+
+    def stats(self):
+        with self.lock:
+            workers = [
+                {'pid': worker.pid, 'alive': worker.is_alive(), 'outstanding': outstanding, 'completed': completed}
+                for worker, outstanding, completed in zip(self.workers, self.outstanding, self.completed)
+            ]
+        for worker in workers:
+            worker['rss_mb'], worker['pss_mb'] = _rss_and_pss_mb(worker['pid'])
+        return {'processes': self.processes, 'alive': self.processes - len(self.dead), 'workers': workers}
+
+    def close(self):
+        self.closing = True
+        for conn, send_lock in zip(self.conns, self.send_locks):
+            with send_lock:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass  # already exited
+        for worker in self.workers:
+            worker.join(timeout=5)
+        self.collector.join(timeout=5)
+        # Workers that didn't stop in time leave their batches unanswered
+        with self.lock:
+            lost = list(self.futures.values())
+            self.futures.clear()
+        for future in lost:
+            future.set_exception(RuntimeError("Inference pool closed"))
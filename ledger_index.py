@@ -0,0 +1,138 @@
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+
+INDEXED_FIELDS = ('username', 'threat_type', 'severity')
+
+
+# Yields (leaf position, incident) for a block; single-incident blocks
+# have no leaf position
+def block_incidents(block):
+    if block['index'] == 0:
+        return
+    if 'incidents' in block:
+        yield from enumerate(block['incidents'])
+    else:
+        yield None, block['data']
+
+
+def to_epoch(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+# Secondary indexes over the incidents of a ThreatBlockchain. Every incident
+# gets a sequential ref id; each index maps a field value to the ascending
+# list of ref ids carrying it. Incident times are stored as recorded, in ref
+# order; their running maximum and suffix minimum are both ascending, so a
+# time range is bisected to a ref range that is then filtered exactly, even
+# after the clock stepped back. Reopened ledgers are indexed on first use.
+class LedgerIndex:
+    def __init__(self, chain):
+        self.chain = chain
+        self.lock = threading.RLock()
+        self.indexed_upto = 0
+        self.refs = []   # ref id -> (block index, leaf position)
+        self.times = []      # ref id -> incident epoch seconds
+        self.max_times = []  # ref id -> max(times[:ref + 1])
+        self.min_times = []  # ref id -> min(times[ref:])
+        self.by_field = {field: {} for field in INDEXED_FIELDS}
+        self.by_incident_id = {}
+
+    def catch_up(self):
+        with self.lock:
+            while self.indexed_upto < len(self.chain):
+                self.add_block(self.chain[self.indexed_upto])
+
+    def add_block(self, block):
+        with self.lock:
+            if block['index'] != self.indexed_upto:
+                return
+            block_epoch = None
+            for position, incident in block_incidents(block):
+                ref = len(self.refs)
+                self.refs.append((block['index'], position))
+                if 'timestamp_ns' in incident:
+                    epoch = incident['timestamp_ns'] / 1e9
+                else:
+                    # Legacy incidents: fall back to parsing the block time once
+                    if block_epoch is None:
+                        block_epoch = to_epoch(block['timestamp'])
+                    epoch = block_epoch
+                self.times.append(epoch)
+                self.max_times.append(max(epoch, self.max_times[-1]) if self.max_times else epoch)
+                # An earlier time lowers the suffix minimum of the refs it precedes
+                j = len(self.min_times)
+                self.min_times.append(epoch)
+                while j and self.min_times[j - 1] > epoch:
+                    j -= 1
+                    self.min_times[j] = epoch
+                for field in INDEXED_FIELDS:
+                    value = incident.get(field)
+                    if value is not None:
+                        self.by_field[field].setdefault(value, []).append(ref)
+                self.by_incident_id[incident.get('incident_id')] = (block['index'], position)
+            self.indexed_upto += 1
+
+    # Distinct values of an indexed field, e.g. for filter dropdowns
+    def values(self, field):
+        self.catch_up()
+        with self.lock:
+            return sorted(self.by_field[field])
+
+    def locate(self, incident_id):
+        self.catch_up()
+        return self.by_incident_id.get(incident_id)
+
+    def resolve(self, ref):
+        block_index, position = self.refs[ref]
+        block = self.chain[block_index]
+        incident = block['data'] if position is None else block['incidents'][position]
+        return {'block': block, 'incident': incident, 'leaf_index': position, 'cursor': ref}
+
+    # Returns (matches, next_cursor). Results are newest first; pass
+    # next_cursor back in to fetch the following page, None means done.
+    def find(self, username=None, threat_type=None, severity=None, since=None, until=None,
+             limit=50, cursor=None):
+        self.catch_up()
+        since = to_epoch(since)
+        until = to_epoch(until)
+        with self.lock:
+            lo = bisect_left(self.max_times, since) if since is not None else 0
+            hi = bisect_right(self.min_times, until) if until is not None else len(self.refs)
+            times = self.times
+            if cursor is not None:
+                hi = min(hi, cursor)
+
+            filters = {'username': username, 'threat_type': threat_type, 'severity': severity}
+            postings = [self.by_field[field].get(value, []) for field, value in filters.items() if value is not None]
+
+            if postings:
+                postings.sort(key=len)
+                driver, others = postings[0], postings[1:]
+                candidates = (
+                    driver[i]
+                    for i in range(bisect_left(driver, hi) - 1, bisect_left(driver, lo) - 1, -1)
+                )
+            else:
+                others = []
+                candidates = iter(range(hi - 1, lo - 1, -1))
+
+            matches = []
+            for ref in candidates:
+                if since is not None and times[ref] < since or until is not None and times[ref] > until:
+                    continue
+                if all(contains(p, ref) for p in others):
+                    if len(matches) == limit:
+                        return [self.resolve(r) for r in matches], matches[-1]
+                    matches.append(ref)
+            return [self.resolve(r) for r in matches], None
+
+
+def contains(sorted_refs, ref):
+    i = bisect_left(sorted_refs, ref)
+    return i < len(sorted_refs) and sorted_refs[i] == ref
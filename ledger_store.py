@@ -0,0 +1,164 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, a single writer is up to the caller
+    fcntl = None
+
+
+RECORD_HEADER = struct.Struct('<I')  # payload length
+INDEX_ENTRY = struct.Struct('<Q')    # record offset in the segment file
+
+
+# Append-only block storage: one length-prefixed JSON record per block in
+# blocks.dat plus a fixed-width offset index in blocks.idx. Opening reads
+# only the file sizes and the tail record; blocks are read through mmap.
+# A writable store holds an exclusive lock on blocks.dat, so a second writer
+# fails instead of forking the chain; readers open with readonly=True.
+class LedgerStore:
+    def __init__(self, directory, fsync_every=32, fsync_interval=1.0, readonly=False):
+        if not readonly:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.readonly = readonly
+        self.lock = threading.RLock()
+
+        mode = 'rb' if readonly else 'a+b'
+        self.data = open(os.path.join(directory, 'blocks.dat'), mode)
+        if not readonly:
+            self._lock_writer()
+        self.index = open(os.path.join(directory, 'blocks.idx'), mode)
+        self.data_map = None
+        self.index_map = None
+        self.pending = 0
+        self.last_sync = time.monotonic()
+        self.tail = None
+
+        self._recover()
+
+    def _lock_writer(self):
+        if fcntl is None:
+            return
+        try:
+            fcntl.flock(self.data.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.data.close()
+            raise RuntimeError(
+                f"Ledger {self.directory} is already open for writing elsewhere; "
+                "only one writer may append to a ledger at a time"
+            ) from None
+
+    # Drops a torn tail left by a crash between the data and index writes
+    def _recover(self):
+        data_size = os.fstat(self.data.fileno()).st_size
+        index_size = os.fstat(self.index.fileno()).st_size
+        count = index_size // INDEX_ENTRY.size
+
+        while count:
+            self.index.seek((count - 1) * INDEX_ENTRY.size)
+            offset, = INDEX_ENTRY.unpack(self.index.read(INDEX_ENTRY.size))
+            if offset + RECORD_HEADER.size <= data_size:
+                self.data.seek(offset)
+                length, = RECORD_HEADER.unpack(self.data.read(RECORD_HEADER.size))
+                end = offset + RECORD_HEADER.size + length
+                if end <= data_size:
+                    break
+            count -= 1
+        else:
+            end = 0
+
+        if not self.readonly:
+            if index_size != count * INDEX_ENTRY.size:
+                self.index.truncate(count * INDEX_ENTRY.size)
+            if data_size != end:
+                self.data.truncate(end)
+        self.count = count
+        self.data_size = end
+
+    def _remap(self):
+        for m in (self.data_map, self.index_map):
+            if m is not None:
+                m.close()
+        if not self.readonly:
+            self.data.flush()
+            self.index.flush()
+        self.data_map = mmap.mmap(self.data.fileno(), 0, access=mmap.ACCESS_READ) if self.data_size else None
+        self.index_map = mmap.mmap(self.index.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def _read(self, i):
+        if self.index_map is None or (i + 1) * INDEX_ENTRY.size > len(self.index_map):
+            self._remap()
+        offset, = INDEX_ENTRY.unpack_from(self.index_map, i * INDEX_ENTRY.size)
+        if self.data_map is None or offset + RECORD_HEADER.size > len(self.data_map):
+            self._remap()
+        length, = RECORD_HEADER.unpack_from(self.data_map, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > len(self.data_map):
+            self._remap()
+        return json.loads(self.data_map[start:start + length])
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        with self.lock:
+            if isinstance(i, slice):
+                return [self._read(j) for j in range(*i.indices(self.count))]
+            if i < 0:
+                i += self.count
+            if not 0 <= i < self.count:
+                raise IndexError('block index out of range')
+            if i == self.count - 1:
+                if self.tail is None:
+                    self.tail = self._read(i)
+                return self.tail
+            return self._read(i)
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def append(self, block):
+        if self.readonly:
+            raise PermissionError('ledger opened read-only')
+        payload = json.dumps(block, separators=(',', ':')).encode()
+        with self.lock:
+            offset = self.data_size
+            self.data.write(RECORD_HEADER.pack(len(payload)) + payload)
+            self.data.flush()
+            self.index.write(INDEX_ENTRY.pack(offset))
+            self.index.flush()
+            self.data_size += RECORD_HEADER.size + len(payload)
+            self.count += 1
+            self.tail = block
+            self.pending += 1
+            if self.pending >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self.sync()
+
+    def sync(self):
+        with self.lock:
+            if self.readonly or not self.pending:
+                return
+            # Data before index, so a synced index entry never points past synced data
+            os.fsync(self.data.fileno())
+            os.fsync(self.index.fileno())
+            self.pending = 0
+            self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            for m in (self.data_map, self.index_map):
+                if m is not None:
+                    m.close()
+            self.data_map = None
+            self.index_map = None
+            self.data.close()
+            self.index.close()
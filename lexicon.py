@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from verdict_cache import normalize_text
+
+
+DEFAULT_LEXICON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicon.json')
+
+
+# Aho-Corasick automaton: one pass over the text finds every term of every
+# category, so matching cost doesn't grow with the number of terms
+class TermAutomaton:
+    def __init__(self, terms):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for term, category in terms:
+            state = 0
+            for char in term:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state].add(category)
+
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, child in self.goto[state].items():
+                pending.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, text):
+        found = set()
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+# Threat-type lexicon loaded from a JSON file; categories are listed in
+# priority order and the file is re-read when it changes on disk
+class Lexicon:
+    def __init__(self, path=DEFAULT_LEXICON_PATH, reload_interval=5.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.checked_at = 0
+        self.load()
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            spec = json.load(f)
+
+        categories = [c['name'] for c in spec['categories']]
+        terms = [
+            (normalize_text(term), c['name'])
+            for c in spec['categories']
+            for term in c['terms']
+            if normalize_text(term)
+        ]
+
+        with self.lock:
+            self.default = spec.get('default', 'Abusive Language')
+            self.categories = categories
+            self.term_count = len(terms)
+            self.automaton = TermAutomaton(terms)
+            self.mtime = os.path.getmtime(self.path)
+            self.checked_at = time.time()
+
+    def reload_if_changed(self):
+        now = time.time()
+        if now - self.checked_at < self.reload_interval:
+            return False
+        self.checked_at = now
+        try:
+            changed = os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return False
+        if changed:
+            self.load()
+        return changed
+
+    def match(self, text):
+        self.reload_if_changed()
+        with self.lock:
+            automaton = self.automaton
+            categories = self.categories
+        found = automaton.search(normalize_text(text))
+        return [c for c in categories if c in found]
+
+    def categorize(self, text):
+        matches = self.match(text)
+        return matches[0] if matches else self.default
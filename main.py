@@ -1,113 +1,78 @@
 import hashlib
 import json
-from datetime import datetime
 import time
-from transformers import pipeline
 from blockchain import ThreatBlockchain
+from backends import LazyClassifier, model_identity
+from batcher import BatchScheduler
+from verdict_cache import VerdictCache
+from lexicon import Lexicon
+from verdicts import build_verdict
+from prefilter import BenignPrefilter
+from pattern_detector import PatternDetector
+from near_duplicates import NearDuplicateIndex
+from timestamps import capture, format_timestamp
+from telemetry import LatencyRecorder, instrument_pipeline
 
 
-# Load model
-def load_model():
-    return pipeline("text-classification", model="unitary/toxic-bert")
-
-try:
-    classifier = load_model()
-    model_loaded = True
-except Exception as e:
-    model_loaded = False
-
-
-# Detect threat
-def detect_threat(text, response_times=None):
-    start_time = time.time()
-    result = classifier(text)[0]
-    end_time = time.time()
-
-    resp_time = (end_time - start_time) * 1000  # ms
-    if response_times is not None:
-        response_times.append(resp_time)
-
-    score = result['score']
-    if score > 0.5:
-        text_lower = text.lower()
-        if any(word in text_lower for word in ['rape', 'r***', 'molest', 'sexual', 'fuck']):
-            threat_type = 'SEXUAL_HARASSMENT'
-        elif any(word in text_lower for word in ['kill', 'hurt', 'murder', 'beat', 'die', 'dead']):
-            threat_type = 'Violent Threat'
-        elif any(word in text_lower for word in ['hate', 'religion', 'muslim', 'hindu', 'christian']):
-            threat_type = 'Hate Speech'
-        else:
-            threat_type = 'Abusive Language'
+lexicon = Lexicon()
+latency = LatencyRecorder()
 
-        if score > 0.9:
-            severity = 'HIGH'
-        elif score > 0.7:
-            severity = 'MEDIUM'
-        else:
-            severity = 'LOW'
-
-        return {
-            'is_threat': True,
-            'threat_type': threat_type,
-            'severity': severity,
-            'confidence': score,
-            'response_time': resp_time
-        }
-    else:
-        return {
-            'is_threat': False,
-            'confidence': 1 - score,
-            'response_time': resp_time
-        }
 
+# The model loads in the background while the prompt is already up
+classifier = LazyClassifier(prepare=lambda c: instrument_pipeline(c, latency)).start()
+verdict_cache = VerdictCache(
+    max_entries=10000, ttl_seconds=24 * 3600, db_path="verdict_cache.db",
+    namespace=model_identity(classifier.backend, classifier.model_name)
+)
+prefilter = BenignPrefilter(threshold=0.97, lexicon=lexicon)
+scheduler = BatchScheduler(classifier, max_batch_size=16, max_wait_ms=5, cache=verdict_cache, prefilter=prefilter)
 
-# This will be used for pattern-attack detection
-def get_watch_group():
-    return ["alice", "bob", "John"]
 
-def check_pattern_attack(threat_history, watched_users=None, lookback=5, window_minutes=5):
+def wait_for_model():
+    if not classifier.ready.is_set():
+        print("Model still warming up, please wait...")
+    classifier.wait()
+
 
-    if len(threat_history) < 2:
-        return None
+def detect_threat(text):
+    start_ns = time.perf_counter_ns()
+    result = scheduler.classify(text)
+    resp_time = (time.perf_counter_ns() - start_ns) / 1e6  # ms
 
-    recent = threat_history[-lookback:]
+    verdict = build_verdict(text, result, lexicon, resp_time)
+    latency.record('end_to_end', time.perf_counter_ns() - start_ns)
+    return verdict
 
-    if watched_users:
-        recent = [t for t in recent if t.get("username") in watched_users]
 
-    if len(recent) <= 2:
-        return None
+# Bulk moderation: identical texts are classified once
+def detect_threats(texts):
+    start_ns = time.perf_counter_ns()
+    results = scheduler.classify_many(texts)
+    resp_time = (time.perf_counter_ns() - start_ns) / 1e6 / max(len(texts), 1)  # ms per text
 
-    time_diffs = []
-    parsed_times = []
-    for t in recent:
-        try:
-            parsed_times.append(datetime.strptime(t['timestamp'], "%Y-%m-%d %H:%M:%S"))
-        except Exception as e:
-            continue
+    verdicts = [build_verdict(text, result, lexicon, resp_time) for text, result in zip(texts, results)]
+    # Whole-batch time goes to its own stage so end_to_end stays per comment
+    latency.record('batch', time.perf_counter_ns() - start_ns)
+    return verdicts
 
-    if len(parsed_times) < 2:
-        return None
 
-    for i in range(1, len(parsed_times)):
-        diff_min = (parsed_times[i] - parsed_times[i-1]).total_seconds() / 60.0
-        time_diffs.append(diff_min)
+# This will be used for pattern-attack detection
+def get_watch_group():
+    return ["alice", "bob", "John"]
 
+# Threats aimed at the post owner; the CLI moderates a single post
+TARGET_USER = "post_owner"
 
-    if any(d < window_minutes for d in time_diffs):
-        return {
-            "attack_detected": True,
-            "threat_count": len(recent),
-            "accounts": list(set([t.get("username", "Unknown") for t in recent])),
-            "time_span": f"{max(time_diffs):.1f} minutes"
-        }
+pattern_detector = PatternDetector(
+    window_seconds=5 * 60, threshold=3, lookback=5,
+    near_duplicates=NearDuplicateIndex(window_seconds=10 * 60)
+)
 
-    return None
+def check_pattern_attack(target, watched_users=None):
+    return pattern_detector.check(target, accounts=watched_users)
 
 
-chain = ThreatBlockchain()
-threat_history = []
-response_times = []
+chain = ThreatBlockchain(path="ledger")
 
 
 while True:
@@ -115,11 +80,15 @@ while True:
     if mode.lower() == "exit":
         break
 
+    # Only blocks appended by this command are printed, not the whole ledger
+    first_new_block = len(chain.chain)
+
     if mode == "1":
         text = input("Enter a comment: ").strip()
         username = input("Enter username: ").strip()
 
-        result = detect_threat(text, response_times)
+        wait_for_model()
+        result = detect_threat(text)
 
         if result['is_threat']:
             threat_data = {
@@ -128,11 +97,12 @@ while True:
                 'threat_type': result['threat_type'],
                 'severity': result['severity'],
                 'confidence': f"{result['confidence']:.2%}",
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                **capture(),
                 'username': username
             }
-            chain.add_threat_block(threat_data)
-            threat_history.append(threat_data)
+            with latency.time('blockchain_append'):
+                chain.add_threat_block(threat_data)
+            pattern_detector.record(TARGET_USER, username, threat_data['timestamp_ns'] / 1e9, text=text)
             print(f"Threat detected and logged for {username}: {result['threat_type']} ({result['severity']})")
         else:
             print("Safe comment")
@@ -140,9 +110,10 @@ while True:
     elif mode == "2":
         text = input("Enter a single comment to simulate across the watched group: ").strip()
         watched = get_watch_group()
+        wait_for_model()
+        results = detect_threats([text] * len(watched))
 
-        for w in watched:
-            result = detect_threat(text, response_times)
+        for w, result in zip(watched, results):
             if result['is_threat']:
                 threat_data = {
                     'incident_id': f"INC_{len(chain.chain)}",
@@ -150,29 +121,38 @@ while True:
                     'threat_type': result['threat_type'],
                     'severity': result['severity'],
                     'confidence': f"{result['confidence']:.2%}",
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    **capture(),
                     'username': w
                 }
-                chain.add_threat_block(threat_data)
-                threat_history.append(threat_data)
+                with latency.time('blockchain_append'):
+                    chain.add_threat_block(threat_data)
+                pattern_detector.record(TARGET_USER, w, threat_data['timestamp_ns'] / 1e9, text=text)
                 print(f"Logged threat for {w}: {result['threat_type']} ({result['severity']})")
             else:
                 print(f"{w}: Safe (not logged)")
 
        
-        pattern = check_pattern_attack(threat_history, watched_users=watched, lookback=5, window_minutes=5)
+        pattern = check_pattern_attack(TARGET_USER, watched_users=watched)
         if pattern:
             print("\nPATTERN ATTACK DETECTED!")
             print(f"Threat count: {pattern['threat_count']}")
             print(f"Accounts: {pattern['accounts']}")
             print(f"Time span: {pattern['time_span']}")
+            if pattern['cluster_id']:
+                print(f"Raid cluster: {pattern['cluster_id']} (accounts: {pattern['cluster_accounts']})")
         else:
             print("No pattern attack detected (not enough threat events in the window).")
 
     else:
         print("Invalid mode. Choose 1, 2 or 'exit'.")
 
+    for stage, summary in latency.summaries().items():
+        if summary:
+            print(f"{stage}: p50 {summary['p50']:.2f}ms | p95 {summary['p95']:.2f}ms | p99 {summary['p99']:.2f}ms ({summary['count']} samples)")
 
-    
-    for block in chain.get_threat_blocks():
+    for block in chain.chain[first_new_block:]:
+        if 'timestamp_ns' in block['data']:
+            block = dict(block, data=dict(block['data'], time=format_timestamp(block['data']['timestamp_ns'])))
         print(json.dumps(block, indent=4))
+
+chain.close()
@@ -0,0 +1,56 @@
+import hashlib
+import json
+
+
+# Leaves and inner nodes use distinct prefixes so a leaf can never be
+# passed off as an inner node (second-preimage protection)
+def leaf_hash(incident):
+    encoded = json.dumps(incident, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha256(b'\x00' + encoded).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b'\x01' + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+# Builds every level bottom-up; an odd node is carried up unchanged
+def merkle_levels(leaves):
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(leaves):
+    if not leaves:
+        return hashlib.sha256(b'').hexdigest()
+    return merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(leaves, position):
+    return proof_from_levels(merkle_levels(leaves), position)
+
+
+# Lets callers proving many leaves of one tree build its levels only once
+def proof_from_levels(levels, position):
+    proof = []
+    for level in levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            proof.append({'position': 'left' if sibling < position else 'right', 'hash': level[sibling]})
+        position //= 2
+    return proof
+
+
+def verify_proof(leaf, proof, root):
+    current = leaf
+    for step in proof:
+        if step['position'] == 'left':
+            current = node_hash(step['hash'], current)
+        else:
+            current = node_hash(current, step['hash'])
+    return current == root
@@ -0,0 +1,62 @@
+import threading
+from collections import deque
+
+from blockchain import ThreatBlockchain
+from incident_store import IncidentStore
+from incident_aggregates import IncidentAggregates
+
+
+# One moderation log per process, shared by every app session: the evidence
+# ledger, the columnar incident store and a bounded feed of approved
+# comments. Writes go through a single lock so incident ids, ledger order and
+# store order always agree; readers only take the lock of what they read.
+# Analytics read running aggregates, which also cover evicted incidents.
+# Sessions keep a cursor (where their view starts) instead of their own copy.
+# The ledger at ledger_path survives restarts; the store, aggregates and
+# comment feed cover this process's activity.
+class SharedModerationLog:
+    def __init__(self, chain=None, incident_capacity=100_000, comment_retention=500, ledger_path="ledger"):
+        self.chain = ThreatBlockchain(path=ledger_path) if chain is None else chain
+        self.incidents = IncidentStore(capacity=incident_capacity)
+        self.aggregates = IncidentAggregates()
+        self.comments = deque(maxlen=comment_retention)
+        self.comments_total = 0
+        self.write_lock = threading.Lock()
+        self.comments_lock = threading.Lock()
+
+    # Current end positions; a session starting here sees only newer activity
+    def cursor(self):
+        with self.write_lock:
+            return {
+                'incidents': self.incidents.total,
+                'comments': self.comments_total,
+                'aggregates': self.aggregates.snapshot()
+            }
+
+    # Assigns the incident id, appends the ledger block and stores the row
+    # as one step; returns (threat_data, block). Ids come from the block
+    # index, so they stay unique across restarts of a persistent ledger.
+    def log_threat(self, threat_data, confidence, text=None):
+        with self.write_lock:
+            threat_data = dict(threat_data, incident_id=f"INC_{len(self.chain.chain)}")
+            block = self.chain.add_threat_block(threat_data)
+            self.incidents.append(
+                username=threat_data['username'],
+                threat_type=threat_data['threat_type'],
+                severity=threat_data['severity'],
+                confidence=confidence,
+                timestamp_ns=threat_data['timestamp_ns'],
+                block_index=block['index'],
+                text=text
+            )
+            self.aggregates.add(threat_data['threat_type'], threat_data['severity'], threat_data['timestamp_ns'])
+        return threat_data, block
+
+    def add_comment(self, comment):
+        with self.comments_lock:
+            self.comments.append(dict(comment, seq=self.comments_total))
+            self.comments_total += 1
+
+    def comments_since(self, cursor):
+        with self.comments_lock:
+            return [comment for comment in self.comments if comment['seq'] >= cursor['comments']]
@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+import zlib
+from collections import Counter, deque
+
+from verdict_cache import normalize_text
+
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def shingles(text, size=5):
+    text = normalize_text(text)
+    if len(text) <= size:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i:i + size].encode()) for i in range(len(text) - size + 1)}
+
+
+# MinHash signatures bucketed with LSH banding: near-duplicate comments share
+# at least one band bucket, so insert and query only touch a handful of
+# candidates instead of every stored comment. Entries older than the window
+# (or beyond max_entries) are evicted, keeping memory bounded. Buckets are
+# keyed by scope (e.g. the targeted user), so comments only cluster with
+# others in the same scope.
+class NearDuplicateIndex:
+    def __init__(self, num_perm=64, bands=16, similarity=0.6, window_seconds=600,
+                 max_entries=100000, max_candidates=16, max_bucket=64, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.similarity = similarity
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.max_candidates = max_candidates
+        self.max_bucket = max_bucket
+
+        rng = random.Random(seed)
+        self.perms = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(MERSENNE_PRIME)) for _ in range(num_perm)]
+
+        self.entries = {}       # entry id -> (epoch, account, signature, cluster id, scope)
+        self.order = deque()    # entry ids, oldest first
+        self.buckets = {}       # (scope, band, band hash) -> entry ids (insertion-ordered dict, newest last)
+        self.clusters = {}      # cluster id -> Counter of accounts
+        self.next_id = 0
+        self.lock = threading.Lock()
+
+    def signature(self, text):
+        hashes = shingles(text)
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in hashes) for a, b in self.perms)
+
+    def band_keys(self, signature, scope=None):
+        rows = self.rows
+        return [(scope, band, hash(signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def _evict(self, now):
+        cutoff = now - self.window_seconds
+        while self.order and (len(self.order) > self.max_entries or self.entries[self.order[0]][0] < cutoff):
+            entry_id = self.order.popleft()
+            _, account, signature, cluster_id, scope = self.entries.pop(entry_id)
+            for key in self.band_keys(signature, scope):
+                bucket = self.buckets.get(key)
+                if bucket is not None:
+                    bucket.pop(entry_id, None)
+                    if not bucket:
+                        del self.buckets[key]
+            members = self.clusters[cluster_id]
+            members[account] -= 1
+            if not members[account]:
+                del members[account]
+            if not members:
+                del self.clusters[cluster_id]
+
+    # Adds a comment and returns its cluster: {'cluster_id', 'accounts', 'size'}
+    def add(self, text, account, epoch=None, scope=None):
+        now = time.time() if epoch is None else epoch
+        signature = self.signature(text)
+        keys = self.band_keys(signature, scope)
+
+        with self.lock:
+            self._evict(now)
+
+            # Candidates sharing the most bands are the likeliest matches;
+            # only the top few get a full signature comparison
+            band_hits = Counter()
+            for key in keys:
+                band_hits.update(self.buckets.get(key, {}).keys())
+
+            best_cluster = None
+            best_score = self.similarity
+            for candidate, _ in band_hits.most_common(self.max_candidates):
+                other = self.entries[candidate]
+                score = sum(x == y for x, y in zip(signature, other[2])) / self.num_perm
+                if score >= best_score:
+                    best_cluster, best_score = other[3], score
+
+            entry_id = self.next_id
+            self.next_id += 1
+            cluster_id = best_cluster or f"RAID_{entry_id}"
+
+            self.entries[entry_id] = (now, account, signature, cluster_id, scope)
+            self.order.append(entry_id)
+            for key in keys:
+                bucket = self.buckets.setdefault(key, {})
+                bucket[entry_id] = None
+                # Huge buckets only hold copies of one raid; the newest
+                # members are enough to keep linking to it
+                if len(bucket) > self.max_bucket:
+                    del bucket[next(iter(bucket))]
+            self.clusters.setdefault(cluster_id, Counter())[account] += 1
+            self._evict(now)
+
+            return self._cluster(cluster_id)
+
+    def cluster(self, cluster_id):
+        with self.lock:
+            return self._cluster(cluster_id)
+
+    def _cluster(self, cluster_id):
+        members = self.clusters.get(cluster_id)
+        if not members:
+            return None
+        return {'cluster_id': cluster_id, 'accounts': list(members), 'size': sum(members.values())}
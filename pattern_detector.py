@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+
+
+class TargetWindow:
+    __slots__ = ('events', 'accounts', 'cluster_id')
+
+    def __init__(self, lookback):
+        self.events = deque(maxlen=lookback)  # (epoch seconds, account)
+        self.accounts = Counter()
+        self.cluster_id = None  # latest near-duplicate cluster spanning several accounts
+
+
+# Streaming coordinated-attack detector. Each targeted user keeps a window
+# of their most recent `lookback` threats inside `window_seconds`, plus a
+# per-account counter, so recording and checking are O(1) amortized. With a
+# NearDuplicateIndex, accounts posting varied copies of the same text are
+# linked into a raid cluster that is reported alongside the window.
+class PatternDetector:
+    def __init__(self, window_seconds=300, threshold=3, lookback=5, max_targets=1_000_000,
+                 near_duplicates=None):
+        self.near_duplicates = near_duplicates
+        self.window_seconds = window_seconds
+        self.threshold = threshold
+        self.lookback = lookback
+        self.max_targets = max_targets
+        self.windows = OrderedDict()  # target -> TargetWindow, least recently active first
+        self.lock = threading.Lock()
+
+    def _expire(self, window, now):
+        cutoff = now - self.window_seconds
+        events = window.events
+        while events and events[0][0] < cutoff:
+            _, account = events.popleft()
+            window.accounts[account] -= 1
+            if not window.accounts[account]:
+                del window.accounts[account]
+
+    def record(self, target, account, epoch=None, text=None):
+        now = time.time() if epoch is None else epoch
+        cluster = None
+        if self.near_duplicates is not None and text is not None:
+            # Scoped per target, so a raid cluster only spans posters aimed at it
+            cluster = self.near_duplicates.add(text, account, now, scope=target)
+
+        with self.lock:
+            window = self.windows.get(target)
+            if window is None:
+                window = self.windows[target] = TargetWindow(self.lookback)
+                if len(self.windows) > self.max_targets:
+                    self.windows.popitem(last=False)
+            else:
+                self.windows.move_to_end(target)
+
+            events = window.events
+            if len(events) == events.maxlen:
+                # The deque is about to drop its oldest event
+                _, oldest = events[0]
+                window.accounts[oldest] -= 1
+                if not window.accounts[oldest]:
+                    del window.accounts[oldest]
+            events.append((now, account))
+            window.accounts[account] += 1
+            if cluster is not None and len(cluster['accounts']) > 1:
+                window.cluster_id = cluster['cluster_id']
+            self._expire(window, now)
+        return self.check(target, now=now)
+
+    # Returns the attack summary if the target is currently under attack,
+    # optionally counting only threats from the given accounts
+    def check(self, target, accounts=None, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            window = self.windows.get(target)
+            if window is None:
+                return None
+            self._expire(window, now)
+            if not window.events:
+                del self.windows[target]
+                return None
+
+            if accounts is None:
+                involved = list(window.accounts)
+                threat_count = len(window.events)
+            else:
+                involved = [a for a in accounts if a in window.accounts]
+                threat_count = sum(window.accounts[a] for a in involved)
+
+            cluster = None
+            if window.cluster_id is not None:
+                cluster = self.near_duplicates.cluster(window.cluster_id)
+                if cluster is None:
+                    window.cluster_id = None
+
+            # A near-duplicate cluster across enough accounts is a raid even
+            # if the timestamps alone wouldn't trip the threshold
+            raid = cluster is not None and len(cluster['accounts']) >= self.threshold
+            if threat_count < self.threshold and not raid:
+                return None
+
+            span_minutes = (window.events[-1][0] - window.events[0][0]) / 60.0
+            return {
+                'attack_detected': True,
+                'target': target,
+                'threat_count': threat_count,
+                'accounts': involved,
+                'time_span': f"{span_minutes:.1f} minutes",
+                'cluster_id': cluster['cluster_id'] if cluster else None,
+                'cluster_accounts': cluster['accounts'] if cluster else []
+            }
+
+    def attack_in_progress(self, target):
+        return self.check(target) is not None
@@ -0,0 +1,126 @@
+import json
+import math
+import random
+import threading
+import zlib
+from array import array
+
+from verdict_cache import normalize_text
+
+
+# Hashed word + character n-gram features
+def hashed_features(text, num_buckets, ngram_range=(3, 5)):
+    text = normalize_text(text)
+    features = set()
+    for word in text.split(' '):
+        if not word:
+            continue
+        features.add(zlib.crc32(('w:' + word).encode()) % num_buckets)
+        padded = f'<{word}>'
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            for i in range(len(padded) - n + 1):
+                features.add(zlib.crc32(('c:' + padded[i:i + n]).encode()) % num_buckets)
+    if not features:
+        # Emoji/punctuation-only or empty input
+        features.add(zlib.crc32(b'empty') % num_buckets)
+    return features
+
+
+# Online logistic model that learns from the classifier's own verdicts and
+# answers confidently-benign inputs without a forward pass. A sample of the
+# inputs it would skip is still sent to the model to keep precision honest.
+class BenignPrefilter:
+    def __init__(self, threshold=0.97, num_buckets=2 ** 18, learning_rate=0.2,
+                 min_updates=500, audit_rate=0.05, lexicon=None):
+        self.threshold = threshold
+        self.num_buckets = num_buckets
+        self.learning_rate = learning_rate
+        self.min_updates = min_updates
+        self.audit_rate = audit_rate
+        self.lexicon = lexicon
+        self.weights = array('d', bytes(8 * num_buckets))
+        self.bias = 0.0
+        self.updates = 0
+        self.lock = threading.Lock()
+
+        self.total = 0
+        self.skipped = 0
+        self.would_skip = 0
+        self.would_skip_correct = 0
+
+    def benign_probability(self, text, features=None):
+        if features is None:
+            features = hashed_features(text, self.num_buckets)
+        scale = 1 / math.sqrt(len(features))
+        z = self.bias + scale * sum(self.weights[f] for f in features)
+        z = max(-30.0, min(30.0, z))
+        return 1 / (1 + math.exp(-z))
+
+    def decide(self, text):
+        with self.lock:
+            self.total += 1
+            if self.updates < self.min_updates:
+                return None
+            # Never fast-path text that hits the threat lexicon
+            if self.lexicon is not None and self.lexicon.match(text):
+                return None
+            p_benign = self.benign_probability(text)
+            if p_benign < self.threshold or random.random() < self.audit_rate:
+                return None
+            self.skipped += 1
+        return {'label': 'toxic', 'score': 1 - p_benign, 'prefilter': True}
+
+    # Called with every model result: trains the model and records whether a
+    # skip would have agreed with the classifier. Lexicon hits are never
+    # skipped by decide(), so they don't count towards its precision.
+    def observe(self, text, result):
+        is_benign = result['score'] <= 0.5
+        features = hashed_features(text, self.num_buckets)
+        skippable = self.lexicon is None or not self.lexicon.match(text)
+        with self.lock:
+            p_benign = self.benign_probability(text, features)
+            if skippable and self.updates >= self.min_updates and p_benign >= self.threshold:
+                self.would_skip += 1
+                if is_benign:
+                    self.would_skip_correct += 1
+
+            gradient = self.learning_rate * ((1.0 if is_benign else 0.0) - p_benign)
+            scale = 1 / math.sqrt(len(features))
+            for f in features:
+                self.weights[f] += gradient * scale
+            self.bias += gradient
+            self.updates += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'updates': self.updates,
+                'total': self.total,
+                'skipped': self.skipped,
+                'skip_rate': self.skipped / self.total if self.total else 0,
+                'audited_skips': self.would_skip,
+                'precision': self.would_skip_correct / self.would_skip if self.would_skip else None
+            }
+
+    def save(self, path):
+        with self.lock:
+            state = {
+                'num_buckets': self.num_buckets,
+                'bias': self.bias,
+                'updates': self.updates,
+                'weights': {str(i): w for i, w in enumerate(self.weights) if w}
+            }
+        with open(path, 'w') as f:
+            json.dump(state, f)
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        if state['num_buckets'] != self.num_buckets:
+            raise ValueError('Prefilter weights were trained with a different bucket count')
+        with self.lock:
+            self.weights = array('d', bytes(8 * self.num_buckets))
+            for i, w in state['weights'].items():
+                self.weights[int(i)] = w
+            self.bias = state['bias']
+            self.updates = state['updates']
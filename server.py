@@ -0,0 +1,393 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import parse_qs
+
+from blockchain import IncidentBatcher, ThreatBlockchain
+from backends import DEFAULT_BACKEND, LazyClassifier, model_identity
+from batcher import BatchScheduler
+from verdict_cache import VerdictCache
+from lexicon import Lexicon
+from verdicts import build_verdict
+from prefilter import BenignPrefilter
+from pattern_detector import PatternDetector
+from near_duplicates import NearDuplicateIndex
+from timestamps import capture, format_timestamp
+from telemetry import LatencyRecorder, instrument_pipeline
+from inference_pool import InferencePool
+from evidence_export import EXPORT_FORMATS, MIME_TYPES, export_evidence
+
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_ITEMS = 256
+DEFAULT_TARGET = "post_owner"
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+
+
+# Moderation pipeline shared by every connection: one model, one ledger and
+# one pattern detector. Blocking work (inference, ledger appends) runs on a
+# thread pool; concurrent requests meet in the BatchScheduler and share
+# forward passes. With batch_window_ms, threats from concurrent requests
+# (e.g. a raid) are logged together as one Merkle batch block per window.
+class ModerationService:
+    def __init__(self, ledger_path="ledger", workers=8, max_pending=256, inference_processes=0, batch_window_ms=0):
+        self.lexicon = Lexicon()
+        self.latency = LatencyRecorder()
+        # The pool forks, so it is created before any other thread starts
+        if inference_processes:
+            self.classifier = InferencePool(processes=inference_processes)
+        else:
+            # Warms up in the background; /healthz reports readiness
+            self.classifier = LazyClassifier(prepare=lambda c: instrument_pipeline(c, self.latency)).start()
+        self.verdict_cache = VerdictCache(
+            max_entries=10000, ttl_seconds=24 * 3600, db_path="verdict_cache.db",
+            namespace=model_identity(DEFAULT_BACKEND)
+        )
+        self.prefilter = BenignPrefilter(threshold=0.97, lexicon=self.lexicon)
+        self.scheduler = BatchScheduler(
+            self.classifier, max_batch_size=16, max_wait_ms=5,
+            cache=self.verdict_cache, prefilter=self.prefilter
+        )
+        self.chain = ThreatBlockchain(path=ledger_path)
+        self.batcher = IncidentBatcher(self.chain, window_seconds=batch_window_ms / 1000) if batch_window_ms else None
+        self.pattern_detector = PatternDetector(
+            window_seconds=5 * 60, threshold=3, lookback=5,
+            near_duplicates=NearDuplicateIndex(window_seconds=10 * 60)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="safeguard-worker")
+        self.max_pending = max_pending
+        self.pending = 0  # texts accepted but not answered yet
+
+    # Appends the incident, or queues it for the next batch block; returns
+    # the verdict and a Future of (block, leaf position)
+    def log_threat(self, text, username, target, verdict):
+        incident = {
+            'text_hash': hashlib.sha256(text.encode()).hexdigest()[:16],
+            'threat_type': verdict['threat_type'],
+            'severity': verdict['severity'],
+            'confidence': f"{verdict['confidence']:.2%}",
+            **capture(),
+            'username': username
+        }
+        if self.batcher is not None:
+            logged = self.batcher.add(incident)
+        else:
+            with self.chain.lock:
+                threat_data = {'incident_id': f"INC_{len(self.chain.chain)}", **incident}
+                with self.latency.time('blockchain_append'):
+                    block = self.chain.add_threat_block(threat_data)
+            logged = Future()
+            logged.set_result((block, None))
+        pattern = self.pattern_detector.record(target, username, incident['timestamp_ns'] / 1e9, text=text)
+        return dict(verdict, pattern_attack=pattern), logged
+
+    # Runs on a worker thread; returns the verdicts and (position, Future)
+    # for every threat logged
+    def moderate(self, items, target):
+        start_ns = time.perf_counter_ns()
+        texts = [item['text'] for item in items]
+        results = self.scheduler.classify_many(texts) if len(texts) > 1 else [self.scheduler.classify(texts[0])]
+        resp_time = (time.perf_counter_ns() - start_ns) / 1e6 / len(texts)  # ms per text
+
+        verdicts, logged = [], []
+        for item, result in zip(items, results):
+            verdict = build_verdict(item['text'], result, self.lexicon, resp_time)
+            if verdict['is_threat'] and item.get('username'):
+                verdict, future = self.log_threat(item['text'], item['username'], target, verdict)
+                logged.append((len(verdicts), future))
+            verdicts.append(verdict)
+        self.latency.record('end_to_end', time.perf_counter_ns() - start_ns)
+        return verdicts, logged
+
+    # Moderates on the thread pool, then waits (without holding a worker)
+    # for batched incidents to reach the ledger. The texts count against
+    # max_pending through both phases, until the request is answered.
+    async def classify(self, items, target):
+        self.reserve(len(items))
+        try:
+            verdicts, logged = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.moderate, items, target
+            )
+            for position, future in logged:
+                block, leaf = await asyncio.wrap_future(future)
+                incident = block['data'] if leaf is None else block['incidents'][leaf]
+                verdicts[position] = dict(
+                    verdicts[position], incident_id=incident['incident_id'], block_index=block['index']
+                )
+            return verdicts
+        finally:
+            self.pending -= len(items)
+
+    def evidence(self, incident_id):
+        proof = self.chain.get_inclusion_proof(incident_id)
+        if proof is None:
+            return None
+        block = self.chain.chain[proof['block_index']]
+        incident = proof['incident']
+        if 'timestamp_ns' in incident:
+            incident = dict(incident, time=format_timestamp(incident['timestamp_ns']))
+        return dict(
+            proof, incident=incident,
+            previous_hash=block['previous_hash'],
+            verified=self.chain.verify_inclusion(proof)
+        )
+
+    # Backpressure: shed load instead of letting the queue grow unbounded.
+    # The caller gives the cost back once it has answered.
+    def reserve(self, cost):
+        if self.pending + cost > self.max_pending:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy, retry later")
+        self.pending += cost
+
+    async def run(self, func, *args, cost=1):
+        self.reserve(cost)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= cost
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'ledger_blocks': len(self.chain.chain),
+            'latency_ms': self.latency.summaries(),
+            'batcher': self.scheduler.stats(),
+            'verdict_cache': self.verdict_cache.stats(),
+            'prefilter': self.prefilter.stats(),
+            'inference_pool': self.classifier.stats() if isinstance(self.classifier, InferencePool) else None
+        }
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.batcher is not None:
+            self.batcher.close()
+        if isinstance(self.classifier, InferencePool):
+            self.classifier.close()
+        self.chain.close()
+
+
+def parse_items(body, batch):
+    try:
+        payload = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be JSON")
+    if not isinstance(payload, dict):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+
+    items = payload.get('items') if batch else [payload]
+    if not isinstance(items, list) or not items:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected a non-empty 'items' list")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"At most {MAX_BATCH_ITEMS} items per batch")
+    # Checked here, before anything can reach the ledger
+    for item in items:
+        if not isinstance(item, dict) or not isinstance(item.get('text'), str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Every item needs a 'text' string")
+        if item.get('username') is not None and not isinstance(item['username'], str):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "'username' must be a string")
+    target = payload.get('target', DEFAULT_TARGET)
+    if not isinstance(target, str) or not target:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "'target' must be a non-empty string")
+    return items, target
+
+
+# Minimal HTTP/1.1 server on asyncio streams: persistent connections,
+# Content-Length bodies only
+class ModerationServer:
+    def __init__(self, service, idle_timeout=15.0):
+        self.service = service
+        self.idle_timeout = idle_timeout
+
+    async def route(self, method, path, body):
+        if path == '/classify' and method == 'POST':
+            items, target = parse_items(body, batch=False)
+            return (await self.service.classify(items, target))[0]
+        if path == '/classify/batch' and method == 'POST':
+            items, target = parse_items(body, batch=True)
+            return {'results': await self.service.classify(items, target)}
+        if path.startswith('/evidence/') and method == 'GET':
+            evidence = await self.service.run(self.service.evidence, path[len('/evidence/'):])
+            if evidence is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown incident_id")
+            return evidence
+        if path == '/stats' and method == 'GET':
+            return self.service.stats()
+        if path == '/healthz' and method == 'GET':
+            classifier = self.service.classifier
+            if isinstance(classifier, LazyClassifier) and not classifier.is_ready():
+                if classifier.error is not None:
+                    raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, f"Model failed to load: {classifier.error}")
+                raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Model warming up")
+            return {'status': 'ok'}
+        if path in ('/classify', '/classify/batch', '/stats', '/healthz', '/export') or path.startswith('/evidence/'):
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def read_request(self, reader):
+        request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode('latin-1').split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported")
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await asyncio.wait_for(reader.readexactly(length), self.idle_timeout) if length else b''
+
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        path, _, query = target.partition('?')
+        return method, path, query, body, keep_alive
+
+    def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, default=str).encode()
+        headers = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            headers.append("Retry-After: 1")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1') + body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HTTPError as e:
+                    self.write_response(writer, e.status, {'error': e.message}, keep_alive=False)
+                    break
+                except ValueError:
+                    # StreamReader.readline raises this for lines over its limit
+                    self.write_response(writer, HTTPStatus.BAD_REQUEST, {'error': "Request line or header too long"}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                method, path, query, body, keep_alive = request
+                try:
+                    if path == '/export' and method == 'GET':
+                        await self.stream_export(writer, query, keep_alive)
+                    else:
+                        self.write_response(writer, HTTPStatus.OK, await self.route(method, path, body), keep_alive)
+                except HTTPError as e:
+                    self.write_response(writer, e.status, {'error': e.message}, keep_alive)
+                except (asyncio.TimeoutError, ConnectionError):
+                    raise
+                except Exception:
+                    logger.exception("Unhandled error serving %s %s", method, path)
+                    keep_alive = False
+                    self.write_response(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal server error"}, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception:
+            logger.exception("Connection handler failed")
+        finally:
+            writer.close()
+
+    # Streams the ledger with chunked transfer encoding; awaiting drain()
+    # after each chunk keeps a slow client from piling up memory
+    async def stream_export(self, writer, query, keep_alive):
+        params = parse_qs(query)
+        fmt = params.get('format', ['csv'])[0]
+        if fmt not in EXPORT_FORMATS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"format must be one of {', '.join(EXPORT_FORMATS)}")
+        include_proof = params.get('proofs', ['0'])[0].lower() in ('1', 'true', 'yes')
+
+        loop = asyncio.get_running_loop()
+        chunks = export_evidence(self.service.chain, fmt, include_proof=include_proof)
+        try:
+            # Pull the first chunk before sending headers so setup errors still get a status code
+            data = await loop.run_in_executor(self.service.executor, next, chunks, None)
+        except ImportError as e:
+            raise HTTPError(HTTPStatus.NOT_IMPLEMENTED, str(e))
+
+        filename = f"evidence_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        headers = [
+            "HTTP/1.1 200 OK",
+            f"Content-Type: {MIME_TYPES[fmt]}",
+            f"Content-Disposition: attachment; filename=\"{filename}\"",
+            "Transfer-Encoding: chunked",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode('latin-1'))
+        while data is not None:
+            if data:
+                writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                await writer.drain()
+            try:
+                data = await loop.run_in_executor(self.service.executor, next, chunks, None)
+            except Exception as e:
+                # The status line is already out; dropping the connection
+                # before the last chunk is how the client learns of it
+                logger.exception("Evidence export failed mid-stream")
+                raise ConnectionAbortedError("Evidence export failed") from e
+        writer.write(b"0\r\n\r\n")
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=1024)
+        print(f"SafeGuard moderation service listening on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP moderation service: /classify, /classify/batch, /evidence/{incident_id}")
+    parser.add_argument('--host', default=os.environ.get('SAFEGUARD_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SAFEGUARD_PORT', 8080)))
+    parser.add_argument('--ledger', default="ledger")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--inference-processes', type=int, default=0, help="fork this many model workers (0: in-process)")
+    parser.add_argument('--max-pending', type=int, default=256)
+    parser.add_argument('--batch-window-ms', type=int, default=0, help="log threats as one Merkle batch block per window (0: a block per threat)")
+    args = parser.parse_args()
+
+    service = ModerationService(
+        ledger_path=args.ledger, workers=args.workers, max_pending=args.max_pending,
+        inference_processes=args.inference_processes, batch_window_ms=args.batch_window_ms
+    )
+    try:
+        asyncio.run(ModerationServer(service).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+
+
+STAGES = ('tokenization', 'forward_pass', 'post_processing', 'blockchain_append', 'end_to_end')
+
+
+# Log-bucketed histogram (HDR-style): fixed memory, every recorded value is
+# placed in a bucket whose bounds are within `precision` of each other
+class LatencyHistogram:
+    def __init__(self, precision=0.02, max_ns=10 ** 12):
+        self.log_base = math.log1p(precision)
+        self.counts = array('Q', bytes(8 * (self._bucket(max_ns) + 1)))
+        self.reset()
+
+    def _bucket(self, ns):
+        return int(math.log(max(ns, 1)) / self.log_base)
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = None
+
+    def record(self, ns):
+        self.counts[min(self._bucket(ns), len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        self.min_ns = ns if self.min_ns is None else min(self.min_ns, ns)
+        self.max_ns = ns if self.max_ns is None else max(self.max_ns, ns)
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                # Upper edge of the bucket, clamped to the observed range
+                value = math.exp((bucket + 1) * self.log_base)
+                return min(max(value, self.min_ns), self.max_ns)
+        return self.max_ns
+
+
+# Per-stage latency histograms measured with perf_counter_ns
+class LatencyRecorder:
+    def __init__(self, stages=STAGES):
+        self.histograms = {stage: LatencyHistogram() for stage in stages}
+        self.lock = threading.Lock()
+
+    def record(self, stage, ns):
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = LatencyHistogram()
+            histogram.record(ns)
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter_ns() - started)
+
+    def reset(self):
+        with self.lock:
+            for histogram in self.histograms.values():
+                histogram.reset()
+
+    # Milliseconds per stage: count, mean, min, max, p50, p95, p99
+    def summary(self, stage):
+        with self.lock:
+            h = self.histograms.get(stage)
+            if h is None or not h.count:
+                return None
+            return {
+                'count': h.count,
+                'mean': h.total_ns / h.count / 1e6,
+                'min': h.min_ns / 1e6,
+                'max': h.max_ns / 1e6,
+                'p50': h.percentile(50) / 1e6,
+                'p95': h.percentile(95) / 1e6,
+                'p99': h.percentile(99) / 1e6
+            }
+
+    def summaries(self):
+        return {stage: self.summary(stage) for stage in self.histograms}
+
+
+# Times the pipeline's own preprocess/forward/postprocess steps, which
+# transformers pipelines call through instance attributes
+def instrument_pipeline(classifier, recorder):
+    steps = (('preprocess', 'tokenization'), ('forward', 'forward_pass'), ('postprocess', 'post_processing'))
+    for method_name, stage in steps:
+        method = getattr(classifier, method_name, None)
+        if method is None:
+            continue
+
+        def timed(*args, _method=method, _stage=stage, **kwargs):
+            started = time.perf_counter_ns()
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                recorder.record(_stage, time.perf_counter_ns() - started)
+
+        setattr(classifier, method_name, timed)
+    return classifier
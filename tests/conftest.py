@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# On-disk ledgers need a signing key kept outside the ledger directory
+@pytest.fixture
+def checkpoint_key(monkeypatch):
+    monkeypatch.setenv('SAFEGUARD_CHECKPOINT_KEY', 'test-key')
+    monkeypatch.delenv('SAFEGUARD_CHECKPOINT_KEY_FILE', raising=False)
+    return b'test-key'
+
+
+def make_incident(i, username=None, timestamp_ns=None):
+    return {
+        'incident_id': f"INC_{i}",
+        'username': username or f"user{i % 3}",
+        'threat_type': 'harassment' if i % 2 else 'hate_speech',
+        'severity': 'HIGH' if i % 4 == 0 else 'LOW',
+        'confidence': '95.00%',
+        'text_hash': f"{i:016x}",
+        'timestamp_ns': timestamp_ns if timestamp_ns is not None else 1_700_000_000_000_000_000 + i * 1_000_000_000
+    }
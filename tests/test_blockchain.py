@@ -0,0 +1,195 @@
+import os
+
+import pytest
+
+from blockchain import HASH_VERSION, ThreatBlockchain, calculate_hash_v1, calculate_hash_v2, check_blocks
+from conftest import make_incident
+from ledger_store import LedgerStore
+
+
+def build_chain(blocks=6, **kwargs):
+    chain = ThreatBlockchain(**kwargs)
+    for i in range(1, blocks + 1):
+        if i % 3 == 0:
+            chain.add_threat_batch([make_incident(i * 10 + j) for j in range(4)])
+        else:
+            chain.add_threat_block(make_incident(i))
+    return chain
+
+
+def test_untouched_chain_verifies_in_every_mode():
+    chain = build_chain()
+    assert chain.verify_chain('full')
+    assert chain.verify_chain('incremental')
+    assert chain.verify_chain('checkpoint')
+
+
+def test_edited_incident_is_detected():
+    chain = build_chain()
+    chain.chain[2]['data']['username'] = 'someone_else'
+    assert not chain.verify_chain('full')
+    assert chain.find_broken_block(1, len(chain.chain)) == 2
+
+
+def test_edited_batch_incident_breaks_its_merkle_root():
+    chain = build_chain()
+    chain.chain[3]['incidents'][1]['severity'] = 'MEDIUM'
+    assert chain.find_broken_block(1, len(chain.chain)) == 3
+
+
+def test_relinked_block_is_detected():
+    chain = build_chain()
+    chain.chain[4]['previous_hash'] = chain.chain[2]['hash']
+    assert chain.find_broken_block(1, len(chain.chain)) == 4
+
+
+def test_incremental_verify_checks_only_new_blocks():
+    chain = build_chain()
+    assert chain.verify_chain('incremental')
+    assert chain.verified_upto == len(chain.chain) - 1
+
+    chain.add_threat_block(make_incident(100))
+    chain.chain[-1]['data']['severity'] = 'LOW'
+    assert not chain.verify_chain('incremental')
+    assert chain.verified_upto == len(chain.chain) - 2
+
+
+def test_incremental_verify_notices_an_edited_verified_tip():
+    chain = build_chain()
+    assert chain.verify_chain('incremental')
+    chain.chain[-1]['hash'] = '0' * 64
+    assert not chain.verify_chain('incremental')
+
+
+def test_parallel_audit_finds_first_broken_block():
+    chain = build_chain(blocks=20)
+    chain.chain[7]['data']['username'] = 'someone_else'
+    chain.chain[15]['data']['username'] = 'someone_else'
+    assert not chain.verify_chain(parallel=2)
+    assert chain.last_audit['first_broken'] == 7
+
+
+def test_reopened_ledger_resumes_from_signed_checkpoint(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    chain = build_chain(blocks=12, path=path, checkpoint_interval=5)
+    chain.close()
+
+    chain = ThreatBlockchain(path=path, checkpoint_interval=5)
+    try:
+        assert chain.verified_upto == 10
+        assert chain.verify_chain('checkpoint')
+        assert chain.verify_chain('full')
+    finally:
+        chain.close()
+
+
+def test_checkpoints_signed_with_another_key_are_ignored(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    build_chain(blocks=12, path=path, checkpoint_interval=5).close()
+
+    chain = ThreatBlockchain(path=path, checkpoint_interval=5, checkpoint_key='other-key')
+    try:
+        assert chain.latest_valid_checkpoint() is None
+        assert chain.verified_upto == 0
+    finally:
+        chain.close()
+
+
+def test_checkpoint_key_file_inside_ledger_is_rejected(tmp_path, monkeypatch):
+    monkeypatch.delenv('SAFEGUARD_CHECKPOINT_KEY', raising=False)
+    path = tmp_path / 'ledger'
+    path.mkdir()
+    key_file = path / 'checkpoint.key'
+    key_file.write_bytes(b'secret')
+    with pytest.raises(ValueError):
+        ThreatBlockchain(path=str(path), checkpoint_key_file=str(key_file))
+
+
+def test_ledger_without_key_keeps_no_checkpoints(tmp_path, monkeypatch):
+    monkeypatch.delenv('SAFEGUARD_CHECKPOINT_KEY', raising=False)
+    monkeypatch.delenv('SAFEGUARD_CHECKPOINT_KEY_FILE', raising=False)
+    path = str(tmp_path / 'ledger')
+    with pytest.warns(UserWarning):
+        chain = build_chain(blocks=12, path=path, checkpoint_interval=5)
+    try:
+        assert chain.checkpoints == []
+        assert not os.path.exists(os.path.join(path, 'checkpoints.jsonl'))
+        assert chain.verify_chain('checkpoint')
+    finally:
+        chain.close()
+
+
+def write_legacy_ledger(path, blocks=4):
+    store = LedgerStore(path)
+    previous_hash = '0'
+    for index in range(blocks):
+        timestamp = f"2023-11-14 22:13:{20 + index:02d}.000000"
+        data = 'Genesis Block - SafeSpot AI Initialized' if index == 0 else make_incident(index)
+        block = {
+            'index': index,
+            'timestamp': timestamp,
+            'data': data,
+            'previous_hash': previous_hash,
+            'hash': calculate_hash_v1(index, timestamp, data, previous_hash)
+        }
+        store.append(block)
+        previous_hash = block['hash']
+    store.close()
+
+
+def test_v2_hash_ignores_key_order_and_differs_from_v1():
+    data = {'username': 'bob', 'severity': 'HIGH'}
+    reordered = {'severity': 'HIGH', 'username': 'bob'}
+    assert calculate_hash_v2(1, 't', data, 'x') == calculate_hash_v2(1, 't', reordered, 'x')
+    assert calculate_hash_v2(1, 't', data, 'x') != calculate_hash_v1(1, 't', data, 'x')
+
+
+def test_legacy_ledger_keeps_verifying_after_v2_appends(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    write_legacy_ledger(path)
+
+    chain = ThreatBlockchain(path=path)
+    try:
+        block = chain.add_threat_block(make_incident(10))
+        chain.add_threat_batch([make_incident(11), make_incident(12)])
+        assert block['version'] == HASH_VERSION
+        assert 'version' not in chain.chain[3]
+        assert chain.verify_chain('full')
+        assert chain.locate_incident('INC_2') == (2, None)
+    finally:
+        chain.close()
+
+
+def test_edited_legacy_block_is_detected(tmp_path):
+    path = str(tmp_path / 'ledger')
+    write_legacy_ledger(path)
+    store = LedgerStore(path, readonly=True)
+    try:
+        blocks = [store[i] for i in range(len(store))]
+    finally:
+        store.close()
+
+    assert check_blocks(blocks[1:], blocks[0]['hash'], 1) is None
+    blocks[2]['data']['username'] = 'someone_else'
+    assert check_blocks(blocks[1:], blocks[0]['hash'], 1) == 2
+
+
+def test_second_writer_on_a_ledger_is_refused(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    chain = build_chain(blocks=2, path=path)
+    try:
+        with pytest.raises(RuntimeError, match="already open for writing"):
+            ThreatBlockchain(path=path)
+        reader = LedgerStore(path, readonly=True)
+        assert len(reader) == 3
+        reader.close()
+    finally:
+        chain.close()
+
+    chain = ThreatBlockchain(path=path)
+    try:
+        chain.add_threat_block(make_incident(99))
+        assert [block['index'] for block in chain.chain] == [0, 1, 2, 3]
+        assert chain.verify_chain('full')
+    finally:
+        chain.close()
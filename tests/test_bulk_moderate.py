@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+import bulk_moderate
+from blockchain import ThreatBlockchain
+from bulk_moderate import BulkModerator
+
+
+class Crash(Exception):
+    pass
+
+
+def fake_classifier(texts, **kwargs):
+    return [{'label': 'toxic', 'score': 0.95 if 'hate' in text else 0.1} for text in texts]
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch, checkpoint_key):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bulk_moderate, 'load_classifier', lambda *args, **kwargs: fake_classifier)
+    with open('comments.jsonl', 'w') as f:
+        for i in range(200):
+            text = f"i hate number {i}" if i % 3 == 0 else f"nice comment {i}"
+            f.write(json.dumps({'id': i, 'text': text, 'username': f"user{i % 5}"}) + '\n')
+    return tmp_path
+
+
+# Wraps function to raise Crash on its at-th call, before or after it runs
+def crashing(function, at, after=False):
+    calls = {'count': 0}
+
+    def wrapper(*args, **kwargs):
+        calls['count'] += 1
+        if calls['count'] == at and not after:
+            raise Crash()
+        result = function(*args, **kwargs)
+        if calls['count'] == at:
+            raise Crash()
+        return result
+    return wrapper
+
+
+def run(prepare=None):
+    moderator = BulkModerator(ledger_path='ledger', batch_size=16)
+    if prepare:
+        prepare(moderator)
+    try:
+        return moderator.run('comments.jsonl', 'verdicts.jsonl', 'verdicts.checkpoint', 'jsonl')
+    finally:
+        moderator.close()
+
+
+def ledger_incidents():
+    chain = ThreatBlockchain(path='ledger')
+    try:
+        assert chain.verify_chain('full')
+        return {
+            incident['incident_id']: block['index']
+            for block in chain.chain[1:] for incident in block['incidents']
+        }
+    finally:
+        chain.close()
+
+
+def test_run_logs_every_threat_once(workdir):
+    report = run()
+    verdicts = [json.loads(line) for line in open('verdicts.jsonl')]
+    incidents = ledger_incidents()
+    assert report['records'] == 200 and report['threats'] == 67
+    assert [verdict['record'] for verdict in verdicts] == list(range(1, 201))
+    assert {v['incident_id']: v['block_index'] for v in verdicts if v['is_threat']} == incidents
+
+
+# Crash points: around the first checkpoint and the write-ahead checkpoint
+# of a batch, and before and after a batch block reaches the ledger
+@pytest.mark.parametrize('target, at, after', [
+    ('save_checkpoint', 1, False),
+    ('save_checkpoint', 2, False),
+    ('save_checkpoint', 5, False),
+    ('save_checkpoint', 6, False),
+    ('add_threat_batch', 3, False),
+    ('add_threat_batch', 3, True),
+])
+def test_resume_after_crash_matches_an_uninterrupted_run(workdir, monkeypatch, target, at, after):
+    with monkeypatch.context() as patch:
+        def crash(moderator):
+            if target == 'save_checkpoint':
+                patch.setattr(bulk_moderate, target, crashing(bulk_moderate.save_checkpoint, at, after))
+            else:
+                moderator.chain.add_threat_batch = crashing(moderator.chain.add_threat_batch, at, after)
+
+        with pytest.raises(Crash):
+            run(crash)
+    report = run()
+
+    verdicts = [json.loads(line) for line in open('verdicts.jsonl')]
+    incidents = ledger_incidents()
+    assert report['records'] == 200 and report['threats'] == 67
+    assert [verdict['record'] for verdict in verdicts] == list(range(1, 201))
+    assert len(incidents) == 67
+    assert len({incident_id.split('_')[1] for incident_id in incidents}) == 1
+    assert {v['incident_id']: v['block_index'] for v in verdicts if v['is_threat']} == incidents
+
+
+def test_finished_run_resumes_as_a_no_op(workdir):
+    run()
+    incidents = ledger_incidents()
+    report = run()
+    assert report['records'] == 200
+    assert ledger_incidents() == incidents
+    assert sum(1 for _ in open('verdicts.jsonl')) == 200
+
+
+def test_malformed_records_get_error_verdicts_and_the_run_continues(workdir):
+    with open('comments.jsonl', 'ab') as f:
+        bad_offset = f.tell()
+        f.write(b'{"id": 200, "text": "truncated\n')
+        list_offset = f.tell()
+        f.write(b'["not", "an", "object"]\n')
+        f.write(b'{"id": 202, "text": "i hate the end", "username": "user2"}\n')
+
+    report = run()
+    verdicts = [json.loads(line) for line in open('verdicts.jsonl')]
+    assert report['records'] == 203 and report['errors'] == 2 and report['threats'] == 68
+    assert verdicts[200]['offset'] == bad_offset and 'invalid JSON' in verdicts[200]['error']
+    assert verdicts[201]['offset'] == list_offset and 'list' in verdicts[201]['error']
+    assert verdicts[202]['is_threat'] and verdicts[202]['id'] == 202
+    assert len(ledger_incidents()) == 68
@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from blockchain import ThreatBlockchain
+from conftest import make_incident
+from evidence_export import EXPORT_COLUMNS, export_csv, export_evidence, export_jsonl, iter_evidence
+from merkle import leaf_hash, verify_proof
+
+
+def build_chain():
+    chain = ThreatBlockchain()
+    chain.add_threat_block(make_incident(0))
+    chain.add_threat_batch([make_incident(i) for i in range(1, 6)])
+    chain.add_threat_block(make_incident(6))
+    chain.add_threat_batch([make_incident(i) for i in range(7, 10)])
+    return chain
+
+
+def test_rows_follow_ledger_order_with_block_fields():
+    chain = build_chain()
+    rows = list(iter_evidence(chain, chunk_blocks=2))
+    assert [row['incident_id'] for row in rows] == [f"INC_{i}" for i in range(10)]
+    assert [row['block_index'] for row in rows] == [1] + [2] * 5 + [3] + [4] * 3
+    assert rows[0]['leaf_index'] is None and rows[0]['merkle_root'] is None
+    assert rows[1]['block_hash'] == chain.chain[2]['hash']
+
+
+def test_exported_proofs_verify_against_the_block_root():
+    chain = build_chain()
+    for row in iter_evidence(chain, include_proof=True):
+        if row['leaf_index'] is None:
+            assert row['proof'] == []
+            continue
+        incident = chain.chain[row['block_index']]['incidents'][row['leaf_index']]
+        assert verify_proof(leaf_hash(incident), row['proof'], row['merkle_root'])
+
+
+def test_csv_is_streamed_in_chunks():
+    chain = build_chain()
+    rows = iter_evidence(chain, include_proof=True, chunk_blocks=1)
+    chunks = list(export_csv(rows, include_proof=True, chunk_rows=3))
+    assert len(chunks) == 4
+    rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))
+    assert list(rows[0]) == EXPORT_COLUMNS + ['proof']
+    assert [row['incident_id'] for row in rows] == [f"INC_{i}" for i in range(10)]
+    assert json.loads(rows[3]['proof']) == next(
+        row['proof'] for row in iter_evidence(chain, include_proof=True) if row['incident_id'] == 'INC_3'
+    )
+
+
+def test_jsonl_matches_rows():
+    chain = build_chain()
+    chunks = list(export_jsonl(iter_evidence(chain), chunk_rows=4))
+    assert len(chunks) == 3
+    lines = b''.join(chunks).decode().splitlines()
+    assert [json.loads(line) for line in lines] == list(iter_evidence(chain))
+
+
+def test_blocks_appended_during_export_are_left_out():
+    chain = build_chain()
+    stream = export_jsonl(iter_evidence(chain, chunk_blocks=1), chunk_rows=1)
+    first = next(stream)
+    chain.add_threat_block(make_incident(10))
+    lines = (first + b''.join(stream)).decode().splitlines()
+    assert len(lines) == 10
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        export_evidence(build_chain(), 'xml')
+
+
+def test_parquet_round_trips():
+    pq = pytest.importorskip('pyarrow.parquet')
+    chain = build_chain()
+    data = b''.join(export_evidence(chain, 'parquet', include_proof=True))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.column('incident_id').to_pylist() == [f"INC_{i}" for i in range(10)]
+
+
+def test_readonly_export_leaves_a_live_ledger_alone(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    writer = ThreatBlockchain(path=path)
+    try:
+        writer.add_threat_batch([make_incident(i) for i in range(3)])
+        writer.sync()
+        # A record flushed ahead of its index entry, as a writer mid-append leaves it
+        with open(os.path.join(path, 'blocks.dat'), 'ab') as f:
+            f.write(b'\x10\x00\x00\x00{"partial":true}')
+        size = os.path.getsize(os.path.join(path, 'blocks.dat'))
+
+        reader = ThreatBlockchain(path=path, readonly=True)
+        try:
+            rows = b''.join(export_evidence(reader, 'jsonl')).decode().splitlines()
+        finally:
+            reader.close()
+        assert len(rows) == 3
+        assert os.path.getsize(os.path.join(path, 'blocks.dat')) == size
+    finally:
+        writer.close()
+
+
+def test_readonly_open_of_a_missing_ledger_fails(tmp_path):
+    path = str(tmp_path / 'missing')
+    with pytest.raises(FileNotFoundError):
+        ThreatBlockchain(path=path, readonly=True)
+    assert not os.path.exists(path)
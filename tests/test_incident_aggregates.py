@@ -0,0 +1,44 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from incident_aggregates import IncidentAggregates
+
+
+@pytest.fixture
+def berlin_time(monkeypatch):
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def local_ns(text):
+    return int(datetime.strptime(text, '%Y-%m-%d %H:%M').timestamp()) * 1_000_000_000
+
+
+def local_starts(aggregates, resolution):
+    return [(datetime.fromtimestamp(start).strftime('%m-%d %H:%M'), count)
+            for start, count in aggregates.timeline(resolution)]
+
+
+# Berlin switches to summer time on 2026-03-29 and back on 2026-10-25
+def test_buckets_follow_local_time_across_dst(berlin_time):
+    aggregates = IncidentAggregates()
+    for text in ('2026-03-29 01:30', '2026-03-29 03:30', '2026-03-29 10:05', '2026-10-25 12:00'):
+        aggregates.add('harassment', 'HIGH', local_ns(text))
+
+    assert local_starts(aggregates, 'hour') == [
+        ('03-29 01:00', 1), ('03-29 03:00', 1), ('03-29 10:00', 1), ('10-25 12:00', 1)
+    ]
+    assert local_starts(aggregates, 'day') == [('03-29 00:00', 3), ('10-25 00:00', 1)]
+
+
+def test_fixed_offset_buckets():
+    aggregates = IncidentAggregates(utc_offset_seconds=3600)
+    aggregates.add('harassment', 'HIGH', 0)
+    aggregates.add('harassment', 'LOW', 23 * 3600 * 1_000_000_000)
+    assert aggregates.timeline('day') == [(-3600, 1), (23 * 3600, 1)]
+    assert aggregates.timeline('minute') == [(0, 1), (23 * 3600, 1)]
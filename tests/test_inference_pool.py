@@ -0,0 +1,64 @@
+import multiprocessing
+import os
+import signal
+import time
+
+import pytest
+
+from inference_pool import InferencePool
+
+pytestmark = pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(), reason="InferencePool needs fork"
+)
+
+
+def fake_classifier(texts, **kwargs):
+    if 'exit' in texts:
+        os._exit(3)
+    if 'hang' in texts:
+        time.sleep(60)
+    return [{'label': 'toxic', 'score': 0.1} for _ in texts]
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(processes=2, classifier=fake_classifier, pin_cpus=False)
+    yield pool
+    pool.close()
+
+
+def test_batches_are_answered(pool):
+    futures = [pool.submit([f"comment {i}"]) for i in range(8)]
+    assert all(future.result(timeout=10) == [{'label': 'toxic', 'score': 0.1}] for future in futures)
+
+
+def test_worker_exit_fails_its_batch_and_leaves_the_rest_working(pool):
+    pool(['warm up'])
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        pool.submit(['exit']).result(timeout=10)
+    assert pool.stats()['alive'] == 1
+    assert [pool(['after']) for _ in range(4)] == [[{'label': 'toxic', 'score': 0.1}]] * 4
+
+
+def test_killed_workers_fail_pending_batches_and_new_submits(pool):
+    hanging = [pool.submit(['hang']) for _ in range(2)]
+    time.sleep(0.2)
+    for worker in pool.workers:
+        os.kill(worker.pid, signal.SIGKILL)
+    for future in hanging:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=10)
+    with pytest.raises(RuntimeError, match="No inference workers"):
+        pool.submit(['late'])
+
+
+def test_pool_is_sized_from_the_cpuset_and_survives_failed_pinning(monkeypatch):
+    # CPUs 62-63 are outside this machine's set, so pinning fails in every worker
+    monkeypatch.setattr(os, 'sched_getaffinity', lambda pid: {62, 63}, raising=False)
+    pool = InferencePool(classifier=fake_classifier)
+    try:
+        assert pool.processes == 2
+        assert [pool([f"comment {i}"]) for i in range(4)] == [[{'label': 'toxic', 'score': 0.1}]] * 4
+        assert pool.stats()['alive'] == 2
+    finally:
+        pool.close()
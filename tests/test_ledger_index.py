@@ -0,0 +1,81 @@
+import random
+
+from blockchain import ThreatBlockchain
+from conftest import make_incident
+
+
+def build_chain(count=60, **kwargs):
+    chain = ThreatBlockchain(**kwargs)
+    i = 0
+    while i < count:
+        if i % 7 == 0:
+            chain.add_threat_batch([make_incident(j) for j in range(i, min(i + 5, count))])
+            i += 5
+        else:
+            chain.add_threat_block(make_incident(i))
+            i += 1
+    return chain
+
+
+def all_pages(chain, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        matches, cursor = chain.find(limit=limit, cursor=cursor, **filters)
+        pages.append([match['incident']['incident_id'] for match in matches])
+        if cursor is None:
+            return pages
+
+
+def test_pages_cover_every_incident_newest_first():
+    chain = build_chain()
+    pages = all_pages(chain, limit=7)
+    assert all(len(page) == 7 for page in pages[:-1])
+    assert [incident_id for page in pages for incident_id in page] == [f"INC_{i}" for i in reversed(range(60))]
+
+
+def test_filtered_pages_match_a_scan():
+    chain = build_chain()
+    pages = all_pages(chain, limit=4, username='user1', severity='LOW')
+    expected = [
+        f"INC_{i}" for i in reversed(range(60))
+        if make_incident(i)['username'] == 'user1' and make_incident(i)['severity'] == 'LOW'
+    ]
+    assert [incident_id for page in pages for incident_id in page] == expected
+
+
+def test_page_size_equal_to_matches_ends_with_no_cursor():
+    chain = build_chain(count=10)
+    matches, cursor = chain.find(limit=10)
+    assert len(matches) == 10 and cursor is None
+
+
+def test_time_range_is_exact_after_clock_steps_back():
+    rng = random.Random(7)
+    times, now = [], 1_700_000_000
+    for _ in range(300):
+        now += rng.randint(1, 20) if rng.random() > 0.1 else -rng.randint(30, 600)
+        times.append(now)
+    chain = ThreatBlockchain()
+    for i, epoch in enumerate(times):
+        chain.add_threat_block(make_incident(i, timestamp_ns=epoch * 1_000_000_000))
+
+    for _ in range(50):
+        since, until = sorted(rng.sample(range(min(times) - 10, max(times) + 10), 2))
+        matches, _ = chain.find(since=since, until=until, limit=len(times))
+        found = [match['incident']['incident_id'] for match in matches]
+        assert found == [f"INC_{i}" for i in reversed(range(len(times))) if since <= times[i] <= until]
+
+
+def test_reopened_and_write_only_ledgers_are_indexed_on_first_query(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    chain = build_chain(count=20, path=path, index_appends=False)
+    assert chain.incident_index.refs == []
+    assert chain.locate_incident('INC_12') is not None
+    chain.close()
+
+    chain = ThreatBlockchain(path=path)
+    try:
+        assert [incident_id for page in all_pages(chain, limit=6) for incident_id in page] == \
+            [f"INC_{i}" for i in reversed(range(20))]
+    finally:
+        chain.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from blockchain import ThreatBlockchain
+from conftest import make_incident
+from merkle import leaf_hash, merkle_proof, merkle_root, node_hash, verify_proof
+
+
+@pytest.mark.parametrize('size', range(1, 10))
+def test_every_leaf_proves_against_the_root(size):
+    leaves = [leaf_hash(make_incident(i)) for i in range(size)]
+    root = merkle_root(leaves)
+    for position, leaf in enumerate(leaves):
+        assert verify_proof(leaf, merkle_proof(leaves, position), root)
+
+
+def test_proof_fails_for_other_leaf_or_root():
+    leaves = [leaf_hash(make_incident(i)) for i in range(5)]
+    root = merkle_root(leaves)
+    proof = merkle_proof(leaves, 2)
+    assert not verify_proof(leaves[3], proof, root)
+    assert not verify_proof(leaves[2], proof, merkle_root(leaves[:4]))
+
+
+def test_root_is_hashed_from_inner_nodes():
+    leaves = [leaf_hash(make_incident(i)) for i in range(4)]
+    inner = node_hash(leaves[0], leaves[1])
+    assert merkle_root([inner, node_hash(leaves[2], leaves[3])]) == merkle_root(leaves)
+
+
+def test_batch_incident_inclusion_proof():
+    chain = ThreatBlockchain()
+    chain.add_threat_block(make_incident(0))
+    chain.add_threat_batch([make_incident(i) for i in range(1, 8)])
+
+    proof = chain.get_inclusion_proof('INC_5')
+    assert proof['block_index'] == 2
+    assert proof['leaf_index'] == 4
+    assert chain.verify_inclusion(proof)
+
+    forged = dict(proof, incident=dict(proof['incident'], username='someone_else'))
+    assert not chain.verify_inclusion(forged)
+
+
+def test_single_incident_block_is_proven_by_its_hash():
+    chain = ThreatBlockchain()
+    chain.add_threat_block(make_incident(0))
+    proof = chain.get_inclusion_proof('INC_0')
+    assert proof['merkle_root'] is None and proof['proof'] == []
+    assert chain.verify_inclusion(proof)
+
+    chain.chain[1]['data']['username'] = 'someone_else'
+    assert not chain.verify_inclusion(proof)
+
+
+def test_unknown_incident_has_no_proof():
+    chain = ThreatBlockchain()
+    assert chain.get_inclusion_proof('INC_404') is None
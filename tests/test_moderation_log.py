@@ -0,0 +1,26 @@
+from moderation_log import SharedModerationLog
+from conftest import make_incident
+
+
+def log_threats(path, count):
+    log = SharedModerationLog(ledger_path=path)
+    try:
+        return [log.log_threat(make_incident(i), 0.95)[0]['incident_id'] for i in range(count)]
+    finally:
+        log.chain.close()
+
+
+def test_evidence_and_ids_survive_a_restart(tmp_path, checkpoint_key):
+    path = str(tmp_path / 'ledger')
+    first = log_threats(path, 3)
+    second = log_threats(path, 2)
+    assert first + second == [f"INC_{i}" for i in range(1, 6)]
+
+    log = SharedModerationLog(ledger_path=path)
+    try:
+        assert len(log.chain.chain) == 6
+        assert log.chain.verify_chain('full')
+        assert log.chain.locate_incident('INC_2') == (2, None)
+        assert log.incidents.total == 0
+    finally:
+        log.chain.close()
@@ -0,0 +1,22 @@
+import time
+from datetime import datetime
+
+
+DISPLAY_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+# Wall-clock epoch for evidence and windows, monotonic clock for ordering
+# bursts within a process; both in nanoseconds
+def capture():
+    return {'timestamp_ns': time.time_ns(), 'monotonic_ns': time.monotonic_ns()}
+
+
+def format_timestamp(timestamp_ns, fmt=DISPLAY_FORMAT):
+    return datetime.fromtimestamp(timestamp_ns / 1e9).strftime(fmt)
+
+
+# Legacy records only carry the formatted string
+def record_display_time(record, fmt=DISPLAY_FORMAT):
+    if 'timestamp_ns' in record:
+        return format_timestamp(record['timestamp_ns'], fmt)
+    return record.get('timestamp', '')
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKC', text).casefold()
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def text_digest(text, namespace=''):
+    return hashlib.sha256((namespace + '\0' + normalize_text(text)).encode()).hexdigest()
+
+
+# LRU/TTL cache of classifier outputs keyed on the normalized-text digest,
+# with an optional SQLite tier so verdicts survive restarts. `namespace`
+# (the backend and model identity) is part of every key, so switching
+# models never serves the old model's verdicts. The SQLite tier is purged
+# of expired rows on open and every `purge_every` writes, and trimmed to
+# its newest `max_db_rows` rows.
+class VerdictCache:
+    def __init__(self, max_entries=10000, max_bytes=8 * 1024 * 1024, ttl_seconds=3600, db_path=None,
+                 namespace='', max_db_rows=1_000_000, purge_every=1000):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.max_db_rows = max_db_rows
+        self.purge_every = purge_every
+        self.db_writes = 0
+        self.entries = OrderedDict()  # digest -> (expires_at, result, size)
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.lock = threading.Lock()
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS verdicts '
+                '(digest TEXT PRIMARY KEY, result TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self.db.execute('CREATE INDEX IF NOT EXISTS verdicts_expires_at ON verdicts (expires_at)')
+            self.db.commit()
+            self.purge_expired()
+
+    def get(self, text):
+        digest = text_digest(text, self.namespace)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(digest)
+
+            if self.db is not None:
+                row = self.db.execute(
+                    'SELECT result, expires_at FROM verdicts WHERE digest = ?', (digest,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    result = json.loads(row[0])
+                    self._store(digest, result, row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return result
+
+            self.misses += 1
+            return None
+
+    def put(self, text, result):
+        digest = text_digest(text, self.namespace)
+        expires_at = time.time() + self.ttl_seconds
+        with self.lock:
+            self._store(digest, result, expires_at)
+            if self.db is not None:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO verdicts (digest, result, expires_at) VALUES (?, ?, ?)',
+                    (digest, json.dumps(result), expires_at)
+                )
+                self.db_writes += 1
+                if self.db_writes % self.purge_every == 0:
+                    self._purge_db(time.time())
+                self.db.commit()
+
+    def _store(self, digest, result, expires_at):
+        if digest in self.entries:
+            self._remove(digest)
+        # Approximate footprint: hex digest plus the serialized result
+        size = len(digest) + len(json.dumps(result))
+        self.entries[digest] = (expires_at, result, size)
+        self.size_bytes += size
+
+        while self.entries and (len(self.entries) > self.max_entries or self.size_bytes > self.max_bytes):
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, digest):
+        _, _, size = self.entries.pop(digest)
+        self.size_bytes -= size
+
+    def purge_expired(self):
+        now = time.time()
+        with self.lock:
+            for digest in [d for d, entry in self.entries.items() if entry[0] <= now]:
+                self._remove(digest)
+            if self.db is not None:
+                self._purge_db(now)
+                self.db.commit()
+
+    # Drops expired rows, then the soonest-expiring (oldest) rows beyond max_db_rows
+    def _purge_db(self, now):
+        self.db.execute('DELETE FROM verdicts WHERE expires_at <= ?', (now,))
+        self.db.execute(
+            'DELETE FROM verdicts WHERE digest IN (SELECT digest FROM verdicts ORDER BY expires_at '
+            'LIMIT max(0, (SELECT COUNT(*) FROM verdicts) - ?))',
+            (self.max_db_rows,)
+        )
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.size_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0
+            }
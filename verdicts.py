@@ -0,0 +1,30 @@
+THREAT_THRESHOLD = 0.5
+
+
+def severity_for(score):
+    if score > 0.9:
+        return 'HIGH'
+    if score > 0.7:
+        return 'MEDIUM'
+    return 'LOW'
+
+
+# Turns a classifier result into the verdict every entry point reports;
+# threat_type comes from the shared lexicon
+def build_verdict(text, result, lexicon, response_time=None):
+    score = result['score']
+    if score > THREAT_THRESHOLD:
+        verdict = {
+            'is_threat': True,
+            'threat_type': lexicon.categorize(text),
+            'severity': severity_for(score),
+            'confidence': score
+        }
+    else:
+        verdict = {
+            'is_threat': False,
+            'confidence': 1 - score
+        }
+    if response_time is not None:
+        verdict['response_time'] = response_time
+    return verdict